@@ -3,6 +3,7 @@ from flask import Flask
 from config import Config
 
 def create_app():
+    Config.load()
     Config.validate()
     app = Flask(__name__)
     app.config.from_object(Config)
@@ -10,16 +11,60 @@ def create_app():
     # Ensure SECRET_KEY is set for production
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', app.config.get('SECRET_KEY', 'dev_secret_key_12345'))
 
+    # Behind the router every request arrives from the proxy, so take the client
+    # address from the headers it sets; rate limits key on it
+    if Config.PROXY_HOPS:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_HOPS, x_proto=Config.PROXY_HOPS)
+
     # Register Blueprints
     from app.routes.auth import auth_bp
     from app.routes.patient import patient_bp
     from app.routes.doctor import doctor_bp
     from app.routes.appointment import appointment_bp
+    from app.routes.admin import admin_bp
+    from app.routes.events import events_bp
 
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(patient_bp, url_prefix='/patient')
     app.register_blueprint(doctor_bp, url_prefix='/doctor')
     app.register_blueprint(appointment_bp, url_prefix='/appointment')
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(events_bp)
+
+    # Return pooled Supabase clients once the request is done
+    from app.utils import release_authenticated_clients
+    app.teardown_appcontext(release_authenticated_clients)
+
+    # Request/upstream latency, Server-Timing header and /metrics
+    from app.metrics import init_metrics, register_gauges
+    from app.supabase_client import get_client_pool
+    from app.auth_cache import get_token_verifier
+    from app.cache import get_cache
+    from app.events import get_event_hub
+    init_metrics(app)
+    register_gauges('pool', lambda: get_client_pool().snapshot())
+    register_gauges('auth', lambda: get_token_verifier().snapshot())
+    register_gauges('cache', lambda: get_cache().snapshot())
+    register_gauges('events', lambda: get_event_hub().snapshot() if get_event_hub() else {})
+
+    # Pages only open /events when a worker can hold the stream, and poll otherwise
+    from app.events import live_updates_enabled, POLL_SECONDS
+    app.add_template_global(live_updates_enabled)
+    app.add_template_global(POLL_SECONDS, 'poll_seconds')
+
+    # Fingerprinted /assets and gzip/brotli for large HTML/JSON responses;
+    # registered after metrics so request latency includes compression
+    from app.assets import init_assets
+    from app.compression import init_compression, compression_snapshot
+    init_assets(app)
+    init_compression(app)
+    register_gauges('compression', compression_snapshot)
+
+    # Shed booking/login bursts with 429/503 before they reach Supabase
+    from app.admission import init_admission, get_admission
+    init_admission(app)
+    register_gauges('admission', lambda: get_admission().snapshot())
     
     # Global Routes
     @app.route('/')
@@ -27,7 +72,22 @@ def create_app():
         from flask import redirect, url_for
         return redirect(url_for('auth.login'))
 
-    return app
+    @app.route('/health/pool')
+    def pool_stats():
+        from flask import jsonify
+        from app.supabase_client import get_client_pool
+        return jsonify(get_client_pool().snapshot())
+
+    @app.route('/health/auth')
+    def auth_stats():
+        from flask import jsonify
+        from app.auth_cache import get_token_verifier
+        return jsonify(get_token_verifier().snapshot())
 
-# Expose app for Gunicorn/Deployment
-app = create_app()
+    @app.route('/health/cache')
+    def cache_stats():
+        from flask import jsonify
+        from app.cache import get_cache
+        return jsonify(get_cache().snapshot())
+
+    return app
@@ -0,0 +1,230 @@
+import os
+import math
+import time
+import threading
+from functools import wraps
+from collections import OrderedDict
+from flask import g, request, jsonify, make_response, render_template
+from app.metrics import REQUESTS_SHED
+
+# Admission control for burst-prone routes (booking, login), so a rush when OPD
+# booking opens is turned away quickly instead of tying up every worker:
+#   - token buckets per user and per route (rate_limited), answered with 429
+#   - a bound on requests in flight per worker (MAX_IN_FLIGHT), answered with 503
+#   - requests that already waited too long in the router queue (MAX_QUEUE_MS,
+#     from X-Request-Start), answered with 503 before any upstream call
+# Buckets live in the worker by default; set RATE_LIMIT_URL (or CACHE_URL) to a
+# Redis-compatible server so every worker and instance shares them.
+
+MAX_IN_FLIGHT = int(os.environ.get("MAX_IN_FLIGHT", 0))
+MAX_QUEUE_MS = int(os.environ.get("MAX_QUEUE_MS", 0))
+
+# Endpoints never shed: health checks, metrics, assets and the long-lived event stream
+EXEMPT_ENDPOINTS = {'static', 'assets.asset', 'metrics', 'pool_stats', 'auth_stats', 'cache_stats', 'events.stream'}
+
+def parse_limit(value):
+    """'5/60' -> (rate per second, burst): 5 requests per 60 seconds, at most 5 at once. '0' disables."""
+    if not value or value.strip() == '0':
+        return None
+    count, seconds = value.split('/')
+    return float(count) / float(seconds), float(count)
+
+# policy: (per user, per route), overridable as RATE_LIMIT_<POLICY> and RATE_LIMIT_<POLICY>_ROUTE
+RATE_LIMITS = {
+    'booking': (os.environ.get('RATE_LIMIT_BOOKING', '5/60'), os.environ.get('RATE_LIMIT_BOOKING_ROUTE', '30/1')),
+    'login': (os.environ.get('RATE_LIMIT_LOGIN', '10/60'), os.environ.get('RATE_LIMIT_LOGIN_ROUTE', '30/1')),
+}
+RATE_LIMITS = {name: (parse_limit(user), parse_limit(route)) for name, (user, route) in RATE_LIMITS.items()}
+
+class MemoryBuckets:
+    """Token buckets in this worker, least recently used evicted past max_size."""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """(allowed, seconds until a token is available)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+# Refill and take in one round trip, on the server's clock so workers agree
+TAKE_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed, wait = 0, (1 - tokens) / rate
+if tokens >= 1 then
+  tokens, allowed, wait = tokens - 1, 1, 0
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+class RedisBuckets:
+    """Token buckets shared by every worker through a Redis-compatible server."""
+
+    def __init__(self, url, prefix='shm:bucket:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_URL is set but the 'redis' package is not installed (pip install redis).")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, rate, burst):
+        allowed, wait = self._take(keys=[self.prefix + key], args=[rate, burst])
+        return bool(allowed), float(wait)
+
+class AdmissionControl:
+    def __init__(self, buckets, max_in_flight=0, max_queue_ms=0):
+        self.buckets = buckets
+        self.max_in_flight = max_in_flight
+        self.max_queue_ms = max_queue_ms
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "rate_limited": 0, "over_capacity": 0, "queue_timeout": 0, "store_errors": 0}
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def take(self, key, limit):
+        rate, burst = limit
+        try:
+            return self.buckets.take(key, rate, burst)
+        except Exception as e:
+            # An unreachable store must not lock everyone out
+            print(f"Rate Limit Error: {e}")
+            self.count("store_errors")
+            return True, 0.0
+
+    def enter(self):
+        with self._lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                self.stats["over_capacity"] += 1
+                return False
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+            data["in_flight"] = self.in_flight
+        data["max_in_flight"] = self.max_in_flight
+        data["store"] = type(self.buckets).__name__
+        return data
+
+_admission = None
+_admission_lock = threading.Lock()
+
+def get_admission() -> AdmissionControl:
+    global _admission
+    if _admission is None:
+        with _admission_lock:
+            if _admission is None:
+                url = os.environ.get("RATE_LIMIT_URL") or os.environ.get("CACHE_URL")
+                buckets = RedisBuckets(url) if url else MemoryBuckets()
+                _admission = AdmissionControl(buckets, MAX_IN_FLIGHT, MAX_QUEUE_MS)
+    return _admission
+
+def _reset_after_fork():
+    # In-flight counts and in-process buckets belong to the worker
+    global _admission, _admission_lock
+    _admission, _admission_lock = None, threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def reject(status, reason, retry_after, message, template=None):
+    REQUESTS_SHED.inc(request.endpoint or "unmatched", reason)
+    if template:
+        response = make_response(render_template(template, error=message), status)
+    elif request.is_json or request.accept_mimetypes.best == 'application/json':
+        response = make_response(jsonify({"error": message}), status)
+    else:
+        response = make_response(message, status)
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def queued_ms():
+    """Time spent between the router and this worker, from X-Request-Start (ms, µs or seconds since epoch)."""
+    value = request.headers.get('X-Request-Start', '').replace('t=', '')
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    while started > 1e11:
+        started /= 1000
+    return (time.time() - started) * 1000
+
+def user_identity():
+    user = g.get('user')
+    return user.id if user is not None else request.remote_addr
+
+def rate_limited(policy, identity=user_identity, template=None, methods=('POST',)):
+    """
+    Per-user and per-route token buckets for a view (see RATE_LIMITS). Place it
+    under login_required so the user is known; identity picks the bucket key.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user_limit, route_limit = RATE_LIMITS[policy]
+            if request.method in methods:
+                admission = get_admission()
+                checks = []
+                if user_limit:
+                    checks.append((f"{policy}:user:{identity()}", user_limit, "Too many requests. Please wait a moment and try again."))
+                if route_limit:
+                    checks.append((f"{policy}:route", route_limit, "We're handling a lot of requests right now. Please try again shortly."))
+                for key, limit, message in checks:
+                    allowed, retry_after = admission.take(key, limit)
+                    if not allowed:
+                        admission.count("rate_limited")
+                        return reject(429, "rate_limited", retry_after, message, template)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def init_admission(app):
+    @app.before_request
+    def admit_request():
+        if request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+        admission = get_admission()
+        if admission.max_queue_ms:
+            waited = queued_ms()
+            if waited is not None and waited > admission.max_queue_ms:
+                admission.count("queue_timeout")
+                return reject(503, "queue_timeout", 1, "Server busy. Please try again.")
+        if not admission.enter():
+            return reject(503, "over_capacity", 1, "Server busy. Please try again.")
+        g.admission_slot = True
+        return None
+
+    @app.teardown_request
+    def release_slot(exc):
+        if g.pop('admission_slot', False):
+            get_admission().leave()
@@ -0,0 +1,62 @@
+import os
+import json
+import mimetypes
+from flask import Blueprint, request, url_for, send_from_directory, abort
+
+# Fingerprinted static assets written by build_assets.py. Names change with the
+# content, so they are served with a one-year immutable Cache-Control and the
+# precompressed .br/.gz variant the client accepts.
+
+DIST_DIR = os.path.join(os.path.dirname(__file__), 'static', 'dist')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+assets_bp = Blueprint('assets', __name__)
+
+_manifest = {}
+_hashed = set()
+
+def load_manifest():
+    global _manifest, _hashed
+    try:
+        with open(os.path.join(DIST_DIR, 'manifest.json')) as f:
+            _manifest = json.load(f)
+    except FileNotFoundError:
+        _manifest = {}
+    except (OSError, ValueError) as e:
+        print(f"Asset Manifest Error: {e}")
+        _manifest = {}
+    _hashed = set(_manifest.values())
+
+def asset_manifest():
+    """Source name -> fingerprinted name for the build this process serves."""
+    return _manifest
+
+def asset_url(filename):
+    """URL of a static file: the fingerprinted build when there is one, plain /static otherwise."""
+    hashed = _manifest.get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets.asset', filename=hashed)
+
+@assets_bp.route('/assets/<path:filename>')
+def asset(filename):
+    if filename not in _hashed:
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.exists(os.path.join(DIST_DIR, filename + suffix)):
+            response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(DIST_DIR, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+def init_assets(app):
+    load_manifest()
+    app.register_blueprint(assets_bp)
+    app.add_template_global(asset_url)
@@ -0,0 +1,200 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+import jwt
+
+class TokenCache:
+    """
+    Bounded LRU of verified users keyed by sha256(access_token).
+    Entries never outlive the token's own exp claim.
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        key = self.key_for(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, token, user, exp=None):
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        if expires_at <= time.time():
+            return
+        key = self.key_for(token)
+        with self._lock:
+            self._entries[key] = (user, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, token):
+        with self._lock:
+            self._entries.pop(self.key_for(token), None)
+
+    def __len__(self):
+        return len(self._entries)
+
+def user_from_claims(claims):
+    # Mirrors the attributes the views read from supabase.auth.get_user().user
+    return SimpleNamespace(
+        id=claims.get('sub'),
+        email=claims.get('email'),
+        phone=claims.get('phone'),
+        role=claims.get('role'),
+        aud=claims.get('aud'),
+        user_metadata=claims.get('user_metadata') or {},
+        app_metadata=claims.get('app_metadata') or {},
+    )
+
+class TokenVerifier:
+    """
+    Verifies Supabase access tokens locally (HS256 project secret or the
+    project's JWKS) and caches the decoded users. Tokens that cannot be
+    verified locally, e.g. signed with an unknown key, fall back to a remote
+    GoTrue get_user call. mode='remote' asks GoTrue on every request and
+    caches nothing, so a revoked session stops working immediately.
+    """
+
+    def __init__(self, auth_client, mode='local', jwt_secret=None, jwks_url=None, cache=None):
+        self.auth_client = auth_client
+        self.mode = mode
+        self.jwt_secret = jwt_secret
+        self.jwks = None
+        self.cache = cache or TokenCache()
+        self._lock = threading.Lock()
+        self.stats = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "local_verified": 0,
+            "remote_verified": 0,
+            "rejected": 0,
+        }
+        if mode == 'local' and jwks_url:
+            try:
+                self.jwks = jwt.PyJWKClient(jwks_url, cache_keys=True, lifespan=3600)
+            except Exception as e:
+                print(f"JWKS Load Error: {e}")
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _verify_locally(self, token):
+        header = jwt.get_unverified_header(token)
+        alg = header.get('alg')
+        if alg == 'HS256' and self.jwt_secret:
+            key = self.jwt_secret
+        elif alg in ('RS256', 'ES256') and self.jwks and header.get('kid'):
+            try:
+                key = self.jwks.get_signing_key(header['kid']).key
+            except jwt.PyJWKClientError:
+                return None
+        else:
+            return None
+        return jwt.decode(token, key, algorithms=[alg], audience='authenticated', options={"require": ["exp", "sub"]})
+
+    def _verify_remotely(self, token):
+        user_response = self.auth_client.get_user(token)
+        if not user_response or not user_response.user:
+            return None, None
+        exp = None
+        try:
+            exp = jwt.decode(token, options={"verify_signature": False}).get('exp')
+        except jwt.PyJWTError:
+            pass
+        return user_response.user, exp
+
+    def verify(self, token):
+        if self.mode == 'remote':
+            user, _ = self._verify_remotely(token)
+            self._count("remote_verified" if user is not None else "rejected")
+            return user
+
+        user = self.cache.get(token)
+        if user is not None:
+            self._count("cache_hits")
+            return user
+        self._count("cache_misses")
+
+        if self.mode == 'local':
+            try:
+                claims = self._verify_locally(token)
+            except jwt.ExpiredSignatureError:
+                self._count("rejected")
+                return None
+            except jwt.PyJWTError:
+                claims = None
+            if claims is not None:
+                self._count("local_verified")
+                user = user_from_claims(claims)
+                self.cache.put(token, user, claims['exp'])
+                return user
+
+        user, exp = self._verify_remotely(token)
+        if user is None:
+            self._count("rejected")
+            return None
+        self._count("remote_verified")
+        self.cache.put(token, user, exp)
+        return user
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+        lookups = data["cache_hits"] + data["cache_misses"]
+        data["hit_rate"] = round(data["cache_hits"] / lookups, 4) if lookups else 0.0
+        data["cached_tokens"] = len(self.cache)
+        return data
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+def get_token_verifier() -> TokenVerifier:
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                from app.supabase_client import get_supabase
+                url = os.environ.get("SUPABASE_URL")
+                jwks_url = f"{url}/auth/v1/.well-known/jwks.json" if url else None
+                cache = TokenCache(
+                    max_size=int(os.environ.get("AUTH_CACHE_SIZE", 1024)),
+                    ttl=int(os.environ.get("AUTH_CACHE_TTL", 300)),
+                )
+                _verifier = TokenVerifier(
+                    get_supabase().auth,
+                    mode=os.environ.get("AUTH_VERIFY_MODE", "local"),
+                    # Project JWT secret; without it (or JWKS) tokens are checked with GoTrue
+                    jwt_secret=os.environ.get("SUPABASE_JWT_SECRET"),
+                    jwks_url=jwks_url,
+                    cache=cache,
+                )
+    return _verifier
+
+def _reset_after_fork():
+    # The verifier holds the parent's auth client; rebuild it in the child
+    global _verifier, _verifier_lock
+    _verifier, _verifier_lock = None, threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
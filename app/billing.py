@@ -0,0 +1,28 @@
+from flask import g
+from app.fanout import run_concurrently
+from app.projections import select_for
+from app.pagination import keyset_after, split_page
+
+MONTHLY_ROLLUP_MONTHS = 12
+
+def ledger_key(entry):
+    return [entry['billed_at'], entry['id']]
+
+def billing_overview(client, role, view, cursor, limit):
+    """
+    One page of the caller's ledger entries (newest first, keyset on (billed_at, id)),
+    with the running total and most recent monthly rollups read from the summary
+    tables, fetched together. role is 'patient' or 'doctor'.
+    Returns (entries, next_cursor, total, monthly).
+    """
+    party_column = 'patient_id' if role == 'patient' else 'doctor_id'
+    ledger = select_for(client, 'billing_ledger', view).eq(party_column, g.user.id)
+    entries, totals, monthly = run_concurrently(
+        keyset_after(ledger, ('billed_at', 'id'), cursor, descending=True)
+            .order('billed_at', desc=True).order('id', desc=True).limit(limit + 1),
+        select_for(client, 'billing_totals', 'billing.totals').eq('party_id', g.user.id).eq('role', role).limit(1),
+        select_for(client, 'billing_monthly', 'billing.monthly').eq('party_id', g.user.id).eq('role', role).order('month', desc=True).limit(MONTHLY_ROLLUP_MONTHS)
+    )
+    rows, next_cursor = split_page(entries.data, ledger_key, limit)
+    total = totals.data[0] if totals.data else {"amount": 0, "entries": 0}
+    return rows, next_cursor, total, monthly.data
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+class MemoryBackend:
+    """In-process LRU with per-key expiry. Suitable for a single worker."""
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_many(self, keys):
+        values = {key: self.get(key) for key in keys}
+        return {key: value for key, value in values.items() if value is not None}
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+class RedisBackend:
+    """
+    Shared store for multi-worker deployments (Redis or any compatible server).
+    Values are stored as JSON so every worker sees the same records.
+    """
+
+    def __init__(self, url, prefix='shm:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL is set but the 'redis' package is not installed (pip install redis).")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def get_many(self, keys):
+        raws = self.client.mget([self.prefix + k for k in keys]) if keys else []
+        return {key: json.loads(raw) for key, raw in zip(keys, raws) if raw is not None}
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(int(ttl), 1))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + k for k in keys])
+
+class Cache:
+    """Read-through cache over a backend, with hit/miss counters."""
+
+    def __init__(self, backend, default_ttl=300):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "errors": 0, "invalidations": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get_or_load(self, key, loader, ttl=None):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never take the page down
+            print(f"Cache Error: {e}")
+            self._count("errors")
+            return loader()
+        if value is not None:
+            self._count("hits")
+            return value
+        self._count("misses")
+        value = loader()
+        if value is not None:
+            try:
+                self.backend.set(key, value, ttl or self.default_ttl)
+            except Exception as e:
+                print(f"Cache Error: {e}")
+                self._count("errors")
+        return value
+
+    def get_many(self, keys):
+        """{key: value} for the keys that are cached, in one round trip; errors read as misses."""
+        try:
+            values = self.backend.get_many(keys)
+        except Exception as e:
+            print(f"Cache Error: {e}")
+            self._count("errors")
+            return {}
+        with self._lock:
+            self.stats["hits"] += len(values)
+            self.stats["misses"] += len(keys) - len(values)
+        return values
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.backend.set(key, value, ttl or self.default_ttl)
+        except Exception as e:
+            print(f"Cache Error: {e}")
+            self._count("errors")
+
+    def invalidate(self, *keys):
+        self._count("invalidations")
+        try:
+            self.backend.delete(*keys)
+        except Exception as e:
+            print(f"Cache Error: {e}")
+            self._count("errors")
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 4) if lookups else 0.0
+        data["backend"] = type(self.backend).__name__
+        return data
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> Cache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                url = os.environ.get("CACHE_URL")
+                backend = RedisBackend(url) if url else MemoryBackend(int(os.environ.get("CACHE_MAX_ENTRIES", 512)))
+                _cache = Cache(backend, default_ttl=int(os.environ.get("CACHE_TTL", 300)))
+    return _cache
@@ -0,0 +1,75 @@
+import os
+import gzip
+import threading
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Negotiated compression of dynamic responses (HTML pages, JSON). Bodies under
+# COMPRESS_MIN_SIZE bytes, streams (the /events feed) and responses that are
+# already encoded (precompressed /assets) are passed through untouched.
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/css", "text/plain", "text/csv",
+    "application/json", "application/javascript", "text/javascript", "image/svg+xml",
+}
+# Moderate levels: dynamic bodies are compressed on every request
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+_stats = {"compressed": 0, "skipped_small": 0, "bytes_in": 0, "bytes_out": 0}
+_stats_lock = threading.Lock()
+
+def choose_encoding(accept_encodings):
+    """Best encoding the client accepts, preferring brotli at equal quality."""
+    candidates = [("br", accept_encodings["br"])] if brotli is not None else []
+    candidates.append(("gzip", accept_encodings["gzip"]))
+    encoding, quality = max(candidates, key=lambda c: c[1])
+    return encoding if quality > 0 else None
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+def compression_snapshot():
+    with _stats_lock:
+        data = dict(_stats)
+    data["ratio"] = round(data["bytes_out"] / data["bytes_in"], 4) if data["bytes_in"] else 0.0
+    return data
+
+def init_compression(app):
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            with _stats_lock:
+                _stats["skipped_small"] += 1
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        compressed = compress(data, encoding)
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        # A strong ETag names exact bytes, so each encoding needs its own
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f"{etag}-{encoding}")
+        with _stats_lock:
+            _stats["compressed"] += 1
+            _stats["bytes_in"] += len(data)
+            _stats["bytes_out"] += len(compressed)
+        return response
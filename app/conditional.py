@@ -0,0 +1,73 @@
+import os
+import re
+import json
+import hashlib
+import datetime
+import threading
+from flask import request, make_response
+from app.cache import get_cache
+from app.assets import asset_manifest
+
+# Conditional responses for pages built from versioned data (see data_versions in
+# schema.sql). The ETag is derived from the data version, the caller, the
+# templates and the asset build, so it is known before any rendering and a
+# matching If-None-Match is answered with a 304 straight away.
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+
+_render_version = None
+_render_version_lock = threading.Lock()
+
+def render_version():
+    """
+    Hash of the templates and the asset manifest, so a deploy that changes markup
+    or the fingerprinted JS/CSS the pages link to changes every ETag and fragment key.
+    """
+    global _render_version
+    if _render_version is None:
+        with _render_version_lock:
+            if _render_version is None:
+                digest = hashlib.sha1()
+                for name in sorted(os.listdir(TEMPLATE_DIR)):
+                    with open(os.path.join(TEMPLATE_DIR, name), 'rb') as f:
+                        digest.update(name.encode() + f.read())
+                digest.update(json.dumps(asset_manifest(), sort_keys=True).encode())
+                _render_version = digest.hexdigest()[:12]
+    return _render_version
+
+def version_etag(*parts):
+    """ETag for a response built from the given parts (data version, user id, page...)."""
+    return hashlib.sha1("|".join(str(p) for p in (render_version(),) + parts).encode()).hexdigest()[:20]
+
+def parse_updated_at(value):
+    """Stamp as a datetime to the second (HTTP dates have no fractions), or None."""
+    if not value:
+        return None
+    # Python 3.10 fromisoformat only takes 3 or 6 fractional digits and PostgREST
+    # trims trailing zeros, so drop the fraction before parsing
+    try:
+        return datetime.datetime.fromisoformat(re.sub(r'\.\d+', '', value.replace('Z', '+00:00'), count=1))
+    except ValueError:
+        return None
+
+def conditional_response(etag, updated_at, build):
+    """
+    304 when the client already has this version, otherwise build() with ETag and
+    Last-Modified attached. Responses are per user, so caches must revalidate.
+    """
+    last_modified = parse_updated_at(updated_at)
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        fresh = bool(last_modified and request.if_modified_since and last_modified <= request.if_modified_since)
+
+    response = make_response('', 304) if fresh else make_response(build())
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def cached_fragment(key, render):
+    """Rendered HTML for key from the shared cache; key must include the data version."""
+    return get_cache().get_or_load(f'fragment:{render_version()}:{key}', render)
@@ -0,0 +1,35 @@
+from app.cache import get_cache
+from app.projections import select_for
+
+# Doctor records change only through doctor.schedule, so they are served from
+# the shared cache and invalidated there. RLS lets every user read doctors and
+# profiles, so one cached copy is valid for all callers. The copy carries the
+# 'doctors' stamp from data_versions, which pages built from it use for ETags
+# and fragment keys.
+DIRECTORY_KEY = 'doctors:all'
+
+def load_directory(client):
+    # Stamp first, rows second (separate requests, so separate snapshots): a write
+    # in between leaves rows newer than the stamp, never stale rows under a new stamp
+    stamp = select_for(client, 'data_versions', 'data_versions.stamp').eq('name', 'doctors').limit(1).execute()
+    doctors = select_for(client, 'doctors', 'doctors.directory').order('id').execute()
+    version = stamp.data[0] if stamp.data else {"version": 0, "updated_at": None}
+    return {"doctors": doctors.data, "version": version['version'], "updated_at": version['updated_at']}
+
+def get_directory(client):
+    """Cached {"doctors": [...], "version": n, "updated_at": iso} for all doctors, ordered by id."""
+    return get_cache().get_or_load(DIRECTORY_KEY, lambda: load_directory(client))
+
+def get_doctor_directory(client):
+    """All doctors with their profile name, ordered by id."""
+    return get_directory(client)['doctors']
+
+def get_doctor(client, doctor_id):
+    """One doctor record with profile name, or None if the user has no doctor row."""
+    def load():
+        res = select_for(client, 'doctors', 'doctors.directory').eq('id', str(doctor_id)).limit(1).execute()
+        return res.data[0] if res.data else None
+    return get_cache().get_or_load(f'doctors:{doctor_id}', load)
+
+def invalidate_doctor(doctor_id):
+    get_cache().invalidate(DIRECTORY_KEY, f'doctors:{doctor_id}')
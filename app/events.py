@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import queue
+import select
+import threading
+
+CHANNEL = 'appointment_changes'
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+# Pages served without live updates poll /events/recent this often; 0 turns polling off
+POLL_SECONDS = int(os.environ.get("EVENTS_POLL_SECONDS", 30))
+# Database setting the notify trigger checks (see notify_appointment_change() in schema.sql)
+PUBLISH_SETTING = 'shm.live_updates'
+
+class EventHub:
+    """
+    One LISTEN connection per process, fanning appointment notifications out to
+    the open streams of the patient and doctor each change concerns. The listener
+    thread starts with the first subscriber, so it always runs in the worker
+    process rather than a pre-fork parent.
+    """
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {"notifications": 0, "delivered": 0, "dropped": 0, "reconnects": 0}
+
+    def subscribe(self, user_id):
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(str(user_id), set()).add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name='event-hub', daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            queues = self._subscribers.get(str(user_id))
+            if queues is not None:
+                queues.discard(q)
+                if not queues:
+                    del self._subscribers[str(user_id)]
+
+    def publish(self, payload):
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            return
+        with self._lock:
+            self.stats["notifications"] += 1
+            targets = [q for uid in {change.get('patient_id'), change.get('doctor_id')}
+                       for q in self._subscribers.get(str(uid), ())]
+        for q in targets:
+            try:
+                q.put_nowait(payload)
+                delivered = "delivered"
+            except queue.Full:
+                # A stalled client loses events rather than holding up everyone else
+                delivered = "dropped"
+            with self._lock:
+                self.stats[delivered] += 1
+
+    def _listen(self):
+        # Imported here so apps without DATABASE_URL never load the driver
+        import psycopg2
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {CHANNEL}")
+                cur.execute("select current_setting(%s, true)", (PUBLISH_SETTING,))
+                if cur.fetchone()[0] != 'on':
+                    print(f"Event Listener Warning: {PUBLISH_SETTING} is not 'on' for this database, "
+                          f"so appointment changes are not published (alter database ... set {PUBLISH_SETTING} = 'on')")
+                while True:
+                    if select.select([conn], [], [], HEARTBEAT_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.publish(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"Event Listener Error: {e}")
+                with self._lock:
+                    self.stats["reconnects"] += 1
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats,
+                        subscribers=sum(len(queues) for queues in self._subscribers.values()),
+                        listening=self._thread is not None)
+
+_hub = None
+_hub_lock = threading.Lock()
+
+def get_event_hub():
+    """The process-wide hub, or None when DATABASE_URL is not configured."""
+    global _hub
+    if _hub is None:
+        dsn = os.environ.get("DATABASE_URL")
+        if not dsn:
+            return None
+        with _hub_lock:
+            if _hub is None:
+                _hub = EventHub(dsn)
+    return _hub
+
+def streaming_enabled():
+    """
+    Streams hold their connection for minutes, so they are only served by
+    gevent workers (SERVING_MODE=gevent); a sync worker would be blocked.
+    """
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("socket")
+
+def live_updates_enabled():
+    return streaming_enabled() and bool(os.environ.get("DATABASE_URL"))
+
+def _reset_after_fork():
+    # The listener thread does not survive a fork
+    global _hub, _hub_lock
+    _hub, _hub_lock = None, threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
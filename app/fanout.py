@@ -0,0 +1,39 @@
+import os
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared per-process pool for independent PostgREST calls within one request.
+# httpx clients are thread-safe, so queries built on the request's authenticated
+# client can run side by side and keep that request's JWT. Created on first use
+# so worker threads always belong to the process that runs them.
+# FANOUT_WORKERS defaults to 8 for sync workers (one request at a time);
+# gunicorn.conf.py sizes it from the connection count in gevent mode.
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=int(os.environ.get("FANOUT_WORKERS", 8)), thread_name_prefix="fanout")
+    return _executor
+
+def _reset_after_fork():
+    global _executor, _executor_lock
+    _executor, _executor_lock = None, threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def run_concurrently(*queries):
+    """
+    Execute independent query builders (anything with .execute()) concurrently and
+    return their responses in the same order. The first failure is re-raised, as it
+    would be when running them one after another.
+    """
+    # Each call runs in a copy of the caller's context so flask.g/request (used by
+    # the metrics hooks) resolve to the current request inside the worker thread.
+    executor = get_executor()
+    futures = [executor.submit(contextvars.copy_context().run, query.execute) for query in queries]
+    return [future.result() for future in futures]
@@ -0,0 +1,178 @@
+import re
+import time
+import threading
+from flask import g, request, has_request_context, Response
+
+# Per-process metrics. Under gunicorn every worker keeps its own registry, so a
+# scrape of /metrics reports the worker that served it (label by instance/pod).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def totals(self, *label_values):
+        """(count, sum) observed for one label set."""
+        with self._lock:
+            series = self._series.get(label_values)
+            return (series["count"], series["sum"]) if series else (0, 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                base = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+                sep = "," if base else ""
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{base}}} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{{{base}}} {series['count']}")
+        return lines
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                base = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+                lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+REQUEST_LATENCY = Histogram(
+    "shm_request_duration_seconds", "Flask request latency by route.", ("endpoint", "method", "status"))
+REQUEST_UPSTREAM_CALLS = Histogram(
+    "shm_request_upstream_calls", "Supabase calls made per request, by route.", ("endpoint",), CALL_COUNT_BUCKETS)
+REQUEST_UPSTREAM_BYTES = Histogram(
+    "shm_request_upstream_bytes", "Response bytes received from Supabase per request, by route.", ("endpoint",), BYTE_BUCKETS)
+UPSTREAM_LATENCY = Histogram(
+    "shm_upstream_duration_seconds", "Supabase call latency by service, table and operation.", ("service", "table", "operation"))
+REQUESTS_SHED = Counter(
+    "shm_requests_shed_total", "Requests rejected by admission control, by route and reason.", ("endpoint", "reason"))
+
+# Snapshot providers (pool, auth cache, record cache...) exported as gauges
+_gauges = {}
+
+def register_gauges(prefix, snapshot):
+    _gauges[prefix] = snapshot
+
+def classify_upstream(req):
+    """Map a Supabase HTTP request to (service, table, operation)."""
+    path = req.url.path
+    method = req.method
+    if "/rest/v1/rpc/" in path:
+        return "postgrest", path.rsplit("/rpc/", 1)[1], "rpc"
+    if "/rest/v1/" in path:
+        table = path.split("/rest/v1/", 1)[1].split("/", 1)[0]
+        if method == "POST":
+            operation = "upsert" if "merge-duplicates" in req.headers.get("Prefer", "") else "insert"
+        else:
+            operation = {"GET": "select", "HEAD": "count", "PATCH": "update", "DELETE": "delete"}.get(method, method.lower())
+        return "postgrest", table, operation
+    if "/auth/v1/" in path:
+        return "gotrue", path.split("/auth/v1/", 1)[1].strip("/") or "root", method.lower()
+    return "other", req.url.host or "", method.lower()
+
+def start_upstream_timer(req):
+    req.extensions["shm_started"] = time.perf_counter()
+
+def record_upstream_call(response):
+    # Read the body here so the timing covers the full transfer
+    response.read()
+    started = response.request.extensions.get("shm_started")
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    service, table, operation = classify_upstream(response.request)
+    UPSTREAM_LATENCY.observe(elapsed, service, table, operation)
+    if has_request_context():
+        calls = g.get("upstream_calls")
+        if calls is not None:
+            calls.append((service, table, operation, elapsed))
+            g.upstream_bytes.append(response.num_bytes_downloaded)
+
+UPSTREAM_HOOKS = {"request": [start_upstream_timer], "response": [record_upstream_call]}
+
+def server_timing(total, calls):
+    """Server-Timing header value: total app time plus one entry per (service, table, operation)."""
+    grouped = {}
+    for service, table, operation, elapsed in calls:
+        key = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{service}.{table}.{operation}")
+        count, duration = grouped.get(key, (0, 0.0))
+        grouped[key] = (count + 1, duration + elapsed)
+    parts = [f"app;dur={total * 1000:.1f}"]
+    for key, (count, duration) in grouped.items():
+        parts.append(f'{key};desc="{count} call{"s" if count != 1 else ""}";dur={duration * 1000:.1f}')
+    return ", ".join(parts)
+
+def render_metrics():
+    lines = []
+    for series in (REQUEST_LATENCY, REQUEST_UPSTREAM_CALLS, REQUEST_UPSTREAM_BYTES, UPSTREAM_LATENCY, REQUESTS_SHED):
+        lines.extend(series.render())
+    for prefix, snapshot in _gauges.items():
+        try:
+            values = snapshot()
+        except Exception as e:
+            print(f"Metrics Error ({prefix}): {e}")
+            continue
+        for key, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = f"shm_{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+def init_metrics(app):
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.upstream_calls = []
+        g.upstream_bytes = []
+
+    @app.after_request
+    def record_request(response):
+        started = g.get("request_started")
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        calls = g.get("upstream_calls") or []
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_LATENCY.observe(total, endpoint, request.method, str(response.status_code))
+        REQUEST_UPSTREAM_CALLS.observe(len(calls), endpoint)
+        REQUEST_UPSTREAM_BYTES.observe(sum(g.get("upstream_bytes") or []), endpoint)
+        response.headers["Server-Timing"] = server_timing(total, calls)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,124 @@
+import json
+import uuid
+import base64
+from flask import request, jsonify, Response, stream_with_context
+from app.conditional import parse_updated_at
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+# Cursor key kinds: each checks one decoded value and raises ValueError if it
+# can't be a key of that kind, so a tampered cursor is a 400 and not a failed query
+def text_key(value):
+    return value
+
+def uuid_key(value):
+    return str(uuid.UUID(value))
+
+def timestamp_key(value):
+    if parse_updated_at(value) is None:
+        raise ValueError("Invalid timestamp")
+    return value
+
+def decode_cursor(cursor, fields):
+    """
+    Returns the list of key values stored in a cursor, or None for the first page.
+    fields lists the kind of each key value (text_key, uuid_key, timestamp_key).
+    """
+    if not cursor:
+        return None
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(fields) or not all(isinstance(v, str) for v in values):
+        raise ValueError("Invalid cursor")
+    try:
+        return [field(value) for field, value in zip(fields, values)]
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+def page_size():
+    size = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+def wants_ndjson():
+    return request.args.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def keyset_after(query, columns, values, descending=False):
+    """
+    Apply a keyset 'after' filter on (col1, col2) ordered ascending, or descending.
+    PostgREST has no row comparison, so it is spelled out as an or() filter.
+    """
+    if values is None:
+        return query
+    first, second = columns
+    op = 'lt' if descending else 'gt'
+    v1, v2 = (f'"{v}"' for v in values)
+    return query.or_(f"{first}.{op}.{v1},and({first}.eq.{v1},{second}.{op}.{v2})")
+
+def split_page(rows, key, limit):
+    """Trim rows fetched with limit + 1 to one page. Returns (rows, next_cursor)."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(key(rows[-1]))
+    return rows, None
+
+def fetch_page(build_query, key, cursor, limit):
+    """
+    Run one keyset page. build_query(after) returns an ordered query for rows after
+    the given key values; key(row) returns the key values of a row.
+    Returns (rows, next_cursor).
+    """
+    return split_page(build_query(cursor).limit(limit + 1).execute().data, key, limit)
+
+def paginated_response(build_query, key, fields):
+    """
+    Serve a keyset-paginated listing, either as one JSON page
+    ({"data": [...], "next_cursor": ...}) or, with ?format=ndjson, as a stream
+    of rows fetched page by page so memory per request stays flat. fields gives
+    the kind of each value key(row) returns (see decode_cursor).
+    """
+    limit = page_size()
+    try:
+        cursor = decode_cursor(request.args.get('cursor'), fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not wants_ndjson():
+        rows, next_cursor = fetch_page(build_query, key, cursor, limit)
+        return jsonify({"data": rows, "next_cursor": next_cursor})
+
+    def generate():
+        after = cursor
+        while True:
+            rows, next_cursor = fetch_page(build_query, key, after, limit)
+            for row in rows:
+                yield json.dumps(row) + '\n'
+            if not next_cursor:
+                break
+            after = key(rows[-1])
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def paginated_list_response(rows, key, fields):
+    """Same contract as paginated_response for rows already in memory, sorted by key."""
+    limit = page_size()
+    try:
+        cursor = decode_cursor(request.args.get('cursor'), fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if cursor is not None:
+        rows = [row for row in rows if key(row) > cursor]
+
+    if wants_ndjson():
+        return Response((json.dumps(row) + '\n' for row in rows), mimetype='application/x-ndjson')
+
+    page = rows[:limit]
+    next_cursor = encode_cursor(key(page[-1])) if len(rows) > limit else None
+    return jsonify({"data": page, "next_cursor": next_cursor})
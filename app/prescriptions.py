@@ -0,0 +1,53 @@
+import datetime
+from flask import request, jsonify
+from app.pagination import decode_cursor, encode_cursor, page_size, timestamp_key, uuid_key
+from app.slots import parse_timestamp
+
+def date_arg(name, end_of_day=False):
+    """ISO date/datetime query argument; a bare date used as an upper bound covers that whole day."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        dt = parse_timestamp(value)
+    except ValueError:
+        raise ValueError(f"Invalid '{name}' date")
+    if end_of_day and len(value) == 10:
+        dt += datetime.timedelta(days=1)
+    return dt.isoformat()
+
+def search_response(client, patient_id=None):
+    """
+    Serve one page of search_prescriptions() (see schema.sql) as
+    {"data": [...], "next_cursor": ...}, newest first. Filters come from the
+    medicine, diagnosis, from and to query arguments.
+    """
+    limit = page_size()
+    try:
+        cursor = decode_cursor(request.args.get('cursor'), (timestamp_key, uuid_key))
+        date_from = date_arg('from')
+        date_to = date_arg('to', end_of_day=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    after_created, after_id = cursor or (None, None)
+
+    rows = client.rpc('search_prescriptions', {
+        "p_patient_id": str(patient_id) if patient_id else None,
+        "p_medicine": request.args.get('medicine') or None,
+        "p_diagnosis": request.args.get('diagnosis') or None,
+        "p_from": date_from,
+        "p_to": date_to,
+        "p_after_created": after_created,
+        "p_after_id": after_id,
+        "p_limit": limit + 1
+    }).execute().data or []
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1]['created_at'], rows[-1]['id']])
+    return jsonify({"data": rows, "next_cursor": next_cursor})
+
+def medication_timeline(client, patient_id):
+    rows = client.rpc('patient_medication_timeline', {"p_patient_id": str(patient_id)}).execute().data
+    return jsonify({"data": rows or []})
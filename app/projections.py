@@ -0,0 +1,29 @@
+# Columns each view renders or returns, in PostgREST select syntax. Every table
+# read in the blueprints goes through select_for(), so a view only ever transfers
+# what it uses and adding a field to a template is a one-line change here.
+# Embeds written as `table!inner()` only filter and return no columns.
+PROJECTIONS = {
+    # Shared doctor records (app/directory.py): doctors list, schedule form,
+    # slot generation and the admin availability feed
+    'doctors.directory': 'id, specialization, available_days, start_time, end_time, consultation_fee, profiles(full_name)',
+
+    'patient.appointment_history': 'id, doctor_id, appointment_date, status, notes',
+    'patient.profile': 'full_name, medical_history',
+    'patient.prescriptions': 'id, diagnosis, medicines, created_at, appointments!inner(appointment_date, doctors(profiles(full_name)))',
+    'patient.billing': 'id, billed_at, fee, doctors(profiles(full_name))',
+
+    'doctor.dashboard': 'id, appointment_date, status, profiles(full_name)',
+    'doctor.patient_details.profile': 'id, full_name, medical_history',
+    'doctor.patient_details.appointments': 'id, appointment_date, status, notes',
+    'doctor.patient_details.prescriptions': 'id, diagnosis, medicines, created_at, appointments!inner()',
+    'doctor.transactions': 'id, billed_at, fee, profiles(full_name)',
+    'admin.profile_role': 'role',
+    'events.recent': 'id, patient_id, doctor_id, appointment_date, status, profiles(full_name)',
+    'billing.totals': 'amount, entries',
+    'billing.monthly': 'month, amount, entries',
+    'data_versions.stamp': 'version, updated_at',
+}
+
+def select_for(client, table, view, **kwargs):
+    """Start a select on table with the columns registered for view."""
+    return client.table(table).select(PROJECTIONS[view], **kwargs)
@@ -1,11 +1,17 @@
 from flask import Blueprint, request, jsonify, g
 from app.utils import login_required, get_authenticated_client, role_required
+from app.slots import available_slots, invalidate_slots, MAX_SLOT_DAYS
+from app.directory import get_doctor, get_doctor_directory
+from app.admission import rate_limited
+import datetime
+import uuid
 
 appointment_bp = Blueprint('appointment', __name__)
 
 @appointment_bp.route('/book', methods=['POST'])
 @login_required
 @role_required('patient')
+@rate_limited('booking')
 def book_appointment():
     client = get_authenticated_client(g.access_token)
     data = request.json
@@ -17,25 +23,20 @@ def book_appointment():
     if not doctor_id or not appointment_date:
         return jsonify({"error": "Missing details"}), 400
 
-    # Conflict validation
-    existing = client.table('appointments').select('id').eq('doctor_id', doctor_id).eq('appointment_date', appointment_date).execute()
+    # Book atomically; the partial unique index rejects a taken slot (see book_appointment() in schema.sql)
+    res = client.rpc('book_appointment', {
+        "p_doctor_id": doctor_id,
+        "p_appointment_date": appointment_date,
+        "p_notes": notes
+    }).execute()
+    result = res.data or {}
     
-    if existing.data:
+    if result.get('status') == 'conflict':
         return jsonify({"error": "Slot unavailable"}), 409
 
-    # Book
-    new_appointment = {
-        "patient_id": g.user.id,
-        "doctor_id": doctor_id,
-        "appointment_date": appointment_date,
-        "notes": notes,
-        "status": "pending"
-    }
-    
-    res = client.table('appointments').insert(new_appointment).execute()
-    
-    if res.data:
-        return jsonify({"message": "Appointment booked", "data": res.data}), 201
+    if result.get('data'):
+        invalidate_slots(doctor_id)
+        return jsonify({"message": "Appointment booked", "data": result['data']}), 201
     else:
         return jsonify({"error": "Booking failed. Please ensure you are logged in as a patient."}), 400
 
@@ -45,6 +46,11 @@ def book_appointment():
 def cancel_appointment(appointment_id):
     client = get_authenticated_client(g.access_token)
     res = client.table('appointments').update({"status": "cancelled"}).eq('id', str(appointment_id)).execute()
+    # Nothing is updated for someone else's appointment or a completed (billed) one
+    if not res.data:
+        return jsonify({"error": "Appointment not found or already completed"}), 404
+    for appt in res.data:
+        invalidate_slots(appt['doctor_id'])
     return jsonify(res.data)
 
 @appointment_bp.route('/reschedule/<uuid:appointment_id>', methods=['POST'])
@@ -58,22 +64,47 @@ def reschedule_appointment(appointment_id):
     if not new_date:
          return jsonify({"error": "New date required"}), 400
 
-    # helper: get doctor_id from appointment to check conflict
-    appt = client.table('appointments').select('doctor_id').eq('id', str(appointment_id)).single().execute()
-    if not appt.data:
-        return jsonify({"error": "Appointment not found"}), 404
-        
-    doctor_id = appt.data['doctor_id']
+    # Move the appointment in one call; conflicts come from the slot index
+    res = client.rpc('reschedule_appointment', {
+        "p_appointment_id": str(appointment_id),
+        "p_appointment_date": new_date
+    }).execute()
+    result = res.data or {}
 
-    # Check conflict
-    existing = client.table('appointments').select('id').eq('doctor_id', doctor_id).eq('appointment_date', new_date).execute()
-    if existing.data:
+    if result.get('status') == 'not_found':
+        return jsonify({"error": "Appointment not found"}), 404
+    if result.get('status') == 'conflict':
         return jsonify({"error": "Slot unavailable"}), 409
 
-    # Update
-    res = client.table('appointments').update({
-        "appointment_date": new_date,
-        "status": "pending" 
-    }).eq('id', str(appointment_id)).execute()
+    for appt in result.get('data', []):
+        invalidate_slots(appt['doctor_id'])
     
-    return jsonify(res.data)
+    return jsonify(result.get('data', []))
+
+@appointment_bp.route('/slots')
+@login_required
+def slots():
+    client = get_authenticated_client(g.access_token)
+    doctor_id = request.args.get('doctor_id')
+    days = min(max(request.args.get('days', 7, type=int), 1), MAX_SLOT_DAYS)
+
+    try:
+        start_day = datetime.date.fromisoformat(request.args['start']) if request.args.get('start') else datetime.date.today()
+    except ValueError:
+        return jsonify({"error": "start must be YYYY-MM-DD"}), 400
+
+    if doctor_id:
+        try:
+            doctor_id = str(uuid.UUID(doctor_id))
+        except ValueError:
+            return jsonify({"error": "doctor_id must be a UUID"}), 400
+        doctor = get_doctor(client, doctor_id)
+        doctors = [doctor] if doctor else []
+    else:
+        doctors = get_doctor_directory(client)
+
+    return jsonify({
+        "start": start_day.isoformat(),
+        "days": days,
+        "slots": available_slots(client, doctors, start_day, days)
+    })
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify, render_template, redirect, url_for, session, make_response
-from app.supabase_client import supabase
+from app.supabase_client import get_supabase
+from app.auth_cache import get_token_verifier
+from app.admission import rate_limited
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -31,7 +33,7 @@ def register():
 
     try:
         # 1. Sign up user
-        auth_response = supabase.auth.sign_up({
+        auth_response = get_supabase().auth.sign_up({
             "email": email,
             "password": password,
             "options": {
@@ -85,7 +87,13 @@ def register():
         print(f"Registration Error: {e}") # Debugging
         return render_template('register.html', error=str(e))
 
+def login_identity():
+    # Not signed in yet: throttle by client and account being tried, so nobody can
+    # lock a real user out by sending bad logins for their address
+    return f"{request.remote_addr}:{(request.form.get('email') or '').strip().lower()}"
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@rate_limited('login', identity=login_identity, template='login.html')
 def login():
     if request.method == 'GET':
         return render_template('login.html')
@@ -96,7 +104,7 @@ def login():
     selected_role = data.get('role', 'patient')
 
     try:
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = get_supabase().auth.sign_in_with_password({
             "email": email,
             "password": password
         })
@@ -109,7 +117,7 @@ def login():
         
         if actual_role != selected_role:
             # Sign out immediately if role mismatch to prevent session persistence
-            supabase.auth.sign_out()
+            get_supabase().auth.sign_out()
             return render_template('login.html', error=f"Invalid login! This account is registered as a {actual_role}.")
 
         target_route = 'patient.dashboard'
@@ -138,7 +146,10 @@ def login_patient():
 
 @auth_bp.route('/logout')
 def logout():
-    supabase.auth.sign_out()
+    access_token = request.cookies.get('access_token')
+    if access_token:
+        get_token_verifier().cache.discard(access_token)
+    get_supabase().auth.sign_out()
     resp = make_response(redirect(url_for('auth.login')))
     resp.set_cookie('access_token', '', expires=0)
     resp.set_cookie('refresh_token', '', expires=0)
@@ -149,7 +160,7 @@ def forgot_password():
     if request.method == 'POST':
         email = request.form.get('email')
         try:
-            supabase.auth.reset_password_for_email(email)
+            get_supabase().auth.reset_password_for_email(email)
             return render_template('forgot_password.html', message="Password reset link sent to your email.")
         except Exception as e:
             return render_template('forgot_password.html', error=str(e))
@@ -1,68 +1,94 @@
-from flask import Blueprint, render_template, g, request, jsonify
+from flask import Blueprint, render_template, g, request, jsonify, current_app
+import uuid
 from app.utils import login_required, get_authenticated_client, role_required
-import datetime
+from app.slots import invalidate_slots
+from app.directory import get_directory, get_doctor, invalidate_doctor
+from app.conditional import version_etag, conditional_response
+from app.fanout import run_concurrently
+from app.projections import select_for
+from app.pagination import decode_cursor, encode_cursor, page_size, text_key, uuid_key, timestamp_key
+from app.prescriptions import search_response, medication_timeline
+from app.billing import billing_overview
 
 doctor_bp = Blueprint('doctor', __name__)
 
+DASHBOARD_PAGE_SIZE = 10
+MAX_BATCH_SIZE = 100
+# HTTP status for each per-item error the batch RPCs report
+BATCH_ERROR_STATUS = {
+    'Invalid status': 400,
+    'Appointment not found': 404,
+    'Slot unavailable': 409,
+}
+
+def valid_batch(items):
+    # Batch RPCs cast appointment ids to uuid, so reject malformed ids up front
+    if not isinstance(items, list) or not items or len(items) > MAX_BATCH_SIZE:
+        return False
+    for item in items:
+        try:
+            uuid.UUID(str(item.get('appointment_id')))
+        except (AttributeError, ValueError):
+            return False
+    return True
+
 @doctor_bp.route('/dashboard')
 @login_required
 @role_required('doctor')
 def dashboard():
     client = get_authenticated_client(g.access_token)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = DASHBOARD_PAGE_SIZE
     
-    # Fetch assigned appointments
-    appointments = client.table('appointments').select('*, profiles(full_name, medical_history)').eq('doctor_id', g.user.id).order('appointment_date', desc=True).execute()
+    offset = (page - 1) * per_page
     
-    # Fetch Doctor Fee for Calculations
-    doc_res = client.table('doctors').select('consultation_fee').eq('id', g.user.id).limit(1).execute()
-    fee = doc_res.data[0]['consultation_fee'] if doc_res.data else 0
+    # Analytics aggregated in SQL (see doctor_dashboard_stats() in schema.sql) and
+    # one page of appointments with only the columns the table renders, fetched together
+    stats_res, appointments = run_concurrently(
+        client.rpc('doctor_dashboard_stats', {}),
+        select_for(client, 'appointments', 'doctor.dashboard').eq('doctor_id', g.user.id).order('appointment_date', desc=True).range(offset, offset + per_page - 1)
+    )
+    stats = stats_res.data or {}
     
-    # Calculate Realtime Analytics
-    total_earnings = 0
-    monthly_income = [0] * 12
-
-    for appt in appointments.data:
-        if appt['status'] == 'completed':
-            total_earnings += fee
-            # Parse Date
-            try:
-                dt_str = appt['appointment_date'].replace('Z', '+00:00')
-                dt = datetime.datetime.fromisoformat(dt_str)
-                monthly_income[dt.month - 1] += fee
-            except:
-                pass
+    total = stats.get('total_appointments', 0)
 
     return render_template('doctor_dashboard.html', 
                            appointments=appointments.data, 
                            user=g.user,
-                           earnings=total_earnings,
-                           monthly_income=monthly_income)
+                           total_appointments=total,
+                           status_counts=stats.get('status_counts') or {},
+                           earnings=stats.get('total_earnings', 0),
+                           monthly_income=stats.get('monthly_income') or [0] * 12,
+                           page=page,
+                           has_next=offset + per_page < total)
 
 @doctor_bp.route('/patients')
 @login_required
 @role_required('doctor')
 def patients():
     client = get_authenticated_client(g.access_token)
-    # Get unique patients from appointments
-    # Supabase doesn't support 'distinct' easy via API sometimes, so we process in python
-    appts = client.table('appointments').select('*, profiles(full_name, medical_history)').eq('doctor_id', g.user.id).execute()
-    
-    patients = {}
-    for a in appts.data:
-        pid = a['patient_id']
-        if pid not in patients:
-            patients[pid] = {
-                'id': pid,
-                'name': a['profiles']['full_name'],
-                'history': a['profiles']['medical_history'],
-                'last_visit': a['appointment_date']
-            }
-        else:
-            # Update last visit if newer
-            if a['appointment_date'] > patients[pid]['last_visit']:
-                patients[pid]['last_visit'] = a['appointment_date']
-    
-    return render_template('doctor_patients.html', patients=list(patients.values()))
+    search = request.args.get('q', '').strip()
+    limit = page_size()
+    try:
+        cursor = decode_cursor(request.args.get('cursor'), (text_key, uuid_key))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    after_name, after_id = cursor or (None, None)
+
+    # One row per patient, aggregated in SQL (see doctor_patient_roster() in schema.sql)
+    roster = client.rpc('doctor_patient_roster', {
+        "p_search": search or None,
+        "p_after_name": after_name,
+        "p_after_id": after_id,
+        "p_limit": limit + 1
+    }).execute().data or []
+
+    next_cursor = None
+    if len(roster) > limit:
+        roster = roster[:limit]
+        next_cursor = encode_cursor([roster[-1]['name'], roster[-1]['id']])
+
+    return render_template('doctor_patients.html', patients=roster, search=search, next_cursor=next_cursor)
 
 @doctor_bp.route('/patients/<uuid:patient_id>')
 @login_required
@@ -70,38 +96,56 @@ def patients():
 def patient_details(patient_id):
     client = get_authenticated_client(g.access_token)
     
-    # 1. Fetch Basic Profile
-    profile = client.table('profiles').select('*').eq('id', str(patient_id)).single().execute()
-    
-    # 2. Fetch Appointment History with this Doctor
-    appointments = client.table('appointments').select('*').eq('doctor_id', g.user.id).eq('patient_id', str(patient_id)).order('appointment_date', desc=True).execute()
-    
-    # 3. Fetch Prescriptions (linked to appointments with this doctor)
-    # We can get prescriptions where appointment.patient_id = patient_id and appointment.doctor_id = current_doctor
-    # Easier: Fetch all prescriptions for appointments in step 2
-    appt_ids = [a['id'] for a in appointments.data]
-    prescriptions = []
-    if appt_ids:
-        res = client.table('prescriptions').select('*').in_('appointment_id', appt_ids).execute()
-        prescriptions = res.data
+    # Profile, appointment history with this doctor and the prescriptions issued on
+    # those appointments are independent, so they are fetched concurrently.
+    # The prescriptions filter goes through the embedded appointment instead of an id list.
+    profile, appointments, prescriptions = run_concurrently(
+        select_for(client, 'profiles', 'doctor.patient_details.profile').eq('id', str(patient_id)).single(),
+        select_for(client, 'appointments', 'doctor.patient_details.appointments').eq('doctor_id', g.user.id).eq('patient_id', str(patient_id)).order('appointment_date', desc=True),
+        select_for(client, 'prescriptions', 'doctor.patient_details.prescriptions').eq('appointments.doctor_id', g.user.id).eq('appointments.patient_id', str(patient_id)).order('created_at', desc=True)
+    )
 
     return render_template('doctor_patient_details.html', 
                            patient=profile.data, 
                            appointments=appointments.data, 
-                           prescriptions=prescriptions)
+                           prescriptions=prescriptions.data)
+
+@doctor_bp.route('/prescriptions/search')
+@login_required
+@role_required('doctor')
+def search_prescriptions():
+    client = get_authenticated_client(g.access_token)
+    patient_id = request.args.get('patient_id')
+    if patient_id:
+        try:
+            patient_id = uuid.UUID(patient_id)
+        except ValueError:
+            return jsonify({"error": "Invalid patient_id"}), 400
+
+    # Searches everything RLS lets this doctor see, optionally narrowed to one patient
+    return search_response(client, patient_id)
+
+@doctor_bp.route('/patients/<uuid:patient_id>/medications')
+@login_required
+@role_required('doctor')
+def patient_medications(patient_id):
+    client = get_authenticated_client(g.access_token)
+    return medication_timeline(client, patient_id)
 
 @doctor_bp.route('/transactions')
 @login_required
 @role_required('doctor')
 def transactions():
     client = get_authenticated_client(g.access_token)
-    doc_res = client.table('doctors').select('consultation_fee').eq('id', g.user.id).limit(1).execute()
-    fee = doc_res.data[0]['consultation_fee'] if doc_res.data else 0
+    try:
+        cursor = decode_cursor(request.args.get('cursor'), (timestamp_key, uuid_key))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # Get completed appointments
-    appts = client.table('appointments').select('*, profiles(full_name)').eq('doctor_id', g.user.id).eq('status', 'completed').order('appointment_date', desc=True).execute()
-    
-    return render_template('doctor_transactions.html', transactions=appts.data, fee=fee)
+    # Completed appointments from the billing ledger, each at the fee charged then
+    entries, next_cursor, totals, monthly = billing_overview(client, 'doctor', 'doctor.transactions', cursor, page_size())
+
+    return render_template('doctor_transactions.html', transactions=entries, total=totals['amount'], monthly=monthly, next_cursor=next_cursor)
 
 @doctor_bp.route('/schedule', methods=['GET', 'POST'])
 @login_required
@@ -137,12 +181,15 @@ def schedule():
 
         # 2. Upsert Doctor
         client.table('doctors').upsert(data).execute()
+        invalidate_doctor(g.user.id)
+        invalidate_slots(g.user.id)
         return render_template('doctor_schedule.html', message="Schedule Updated!", doctor=data)
 
     # GET
-    response = client.table('doctors').select('*, profiles(full_name)').eq('id', g.user.id).limit(1).execute()
-    doctor_data = response.data[0] if response.data else {}
-    return render_template('doctor_schedule.html', doctor=doctor_data)
+    directory = get_directory(client)
+    etag = version_etag('doctor.schedule', directory['version'], g.user.id)
+    return conditional_response(etag, directory['updated_at'], lambda: render_template(
+        'doctor_schedule.html', doctor=get_doctor(client, g.user.id) or {}))
 
 @doctor_bp.route('/appointment/<uuid:appointment_id>/status', methods=['POST'])
 @login_required
@@ -162,6 +209,9 @@ def update_status(appointment_id):
             print(f"Update Error: {res.error}")
             return jsonify({"error": str(res.error)}), 400
         print(f"Update Success: {res.data}")
+        if new_status == 'cancelled':
+            for appt in res.data:
+                invalidate_slots(appt['doctor_id'])
         return jsonify(res.data)
     except Exception as e:
         print(f"Update Exception: {e}")
@@ -178,18 +228,55 @@ def create_prescription(appointment_id):
     medicines = data.get('medicines') # List of objects
     
     try:
-        # 1. Update Appointment to Completed
-        client.table('appointments').update({"status": "completed"}).eq('id', str(appointment_id)).execute()
-        
-        # 2. Insert Prescription
-        prescription_data = {
+        # Complete the appointment and insert the prescription in one transaction
+        res = client.rpc('doctor_bulk_prescribe', {"p_prescriptions": [{
             "appointment_id": str(appointment_id),
             "diagnosis": diagnosis,
             "medicines": medicines
-        }
-        
-        res = client.table('prescriptions').insert(prescription_data).execute()
-        return jsonify(res.data)
+        }]}).execute()
+        result = res.data[0]
+        if not result['ok']:
+            return jsonify({"error": result['error']}), BATCH_ERROR_STATUS.get(result['error'], 400)
+        return jsonify([result['data']])
     except Exception as e:
         print(f"Prescription Error: {e}")
         return jsonify({"error": str(e)}), 500
+
+@doctor_bp.route('/appointments/status', methods=['POST'])
+@login_required
+@role_required('doctor')
+def batch_update_status():
+    client = get_authenticated_client(g.access_token)
+    updates = (request.json or {}).get('updates')
+
+    if not valid_batch(updates):
+        return jsonify({"error": f"updates must be a list of 1-{MAX_BATCH_SIZE} items with valid appointment ids"}), 400
+
+    try:
+        res = client.rpc('doctor_batch_update_status', {"p_updates": updates}).execute()
+    except Exception as e:
+        current_app.logger.error("Batch status update failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+    for result in res.data:
+        if result['ok'] and result['data']['status'] == 'cancelled':
+            invalidate_slots(result['data']['doctor_id'])
+    return jsonify({"results": res.data})
+
+@doctor_bp.route('/prescriptions/bulk', methods=['POST'])
+@login_required
+@role_required('doctor')
+def bulk_prescribe():
+    client = get_authenticated_client(g.access_token)
+    prescriptions = (request.json or {}).get('prescriptions')
+
+    if not valid_batch(prescriptions):
+        return jsonify({"error": f"prescriptions must be a list of 1-{MAX_BATCH_SIZE} items with valid appointment ids"}), 400
+
+    try:
+        res = client.rpc('doctor_bulk_prescribe', {"p_prescriptions": prescriptions}).execute()
+    except Exception as e:
+        current_app.logger.error("Bulk prescription failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({"results": res.data})
@@ -0,0 +1,75 @@
+import os
+import time
+import queue
+import hashlib
+import datetime
+from flask import Blueprint, Response, jsonify, g, stream_with_context
+from app.utils import login_required, get_authenticated_client
+from app.events import get_event_hub, streaming_enabled, HEARTBEAT_SECONDS
+from app.projections import select_for
+from app.conditional import version_etag, conditional_response
+
+events_bp = Blueprint('events', __name__)
+
+# Streams are closed after this long so the browser reconnects and the access
+# token is checked again
+MAX_STREAM_SECONDS = int(os.environ.get("EVENTS_MAX_STREAM_SECONDS", 300))
+
+# What /events/recent returns: the newest bookings among appointments that are
+# upcoming or less than RECENT_DAYS old
+RECENT_DAYS = 7
+RECENT_LIMIT = 200
+
+@events_bp.route('/events')
+@login_required
+def stream():
+    """
+    Server-sent appointment changes for the logged-in user only. Each open stream
+    holds a worker connection, so streams are only served with SERVING_MODE=gevent.
+    """
+    if not streaming_enabled():
+        # 204 tells EventSource to stop reconnecting
+        return '', 204
+    hub = get_event_hub()
+    if hub is None:
+        return jsonify({"error": "Live updates are not configured"}), 503
+
+    user_id = g.user.id
+    q = hub.subscribe(user_id)
+
+    def generate():
+        deadline = time.monotonic() + MAX_STREAM_SECONDS
+        try:
+            yield "retry: 5000\n\n"
+            while time.monotonic() < deadline:
+                try:
+                    payload = q.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: appointment\ndata: {payload}\n\n"
+        finally:
+            hub.unsubscribe(user_id, q)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@events_bp.route('/events/recent')
+@login_required
+def recent():
+    """
+    The user's recent appointments, for pages served without /events: they poll
+    this and compare answers to spot new bookings and status changes. An
+    unchanged answer is a 304.
+    """
+    client = get_authenticated_client(g.access_token)
+    column = 'doctor_id' if g.user_role == 'doctor' else 'patient_id'
+    since = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=RECENT_DAYS)).isoformat()
+    rows = select_for(client, 'appointments', 'events.recent').eq(column, g.user.id).gte('appointment_date', since).order('created_at', desc=True).limit(RECENT_LIMIT).execute().data
+    # Same shape as the streamed changes
+    for row in rows:
+        row['patient_name'] = (row.pop('profiles', None) or {}).get('full_name')
+
+    response = jsonify({"data": rows})
+    etag = version_etag('events.recent', g.user.id, hashlib.sha1(response.get_data()).hexdigest())
+    return conditional_response(etag, None, lambda: response)
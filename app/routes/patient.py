@@ -1,5 +1,11 @@
 from flask import Blueprint, render_template, jsonify, g, request
 from app.utils import login_required, get_authenticated_client, role_required
+from app.pagination import paginated_response, keyset_after, decode_cursor, page_size, timestamp_key, uuid_key
+from app.directory import get_directory
+from app.conditional import version_etag, conditional_response, cached_fragment
+from app.projections import select_for
+from app.prescriptions import search_response, medication_timeline
+from app.billing import billing_overview
 
 patient_bp = Blueprint('patient', __name__)
 
@@ -9,46 +15,48 @@ patient_bp = Blueprint('patient', __name__)
 def dashboard():
     client = get_authenticated_client(g.access_token)
     
-    # 1. Fetch upcoming appointments (pending/confirmed)
-    appointments = client.table('appointments').select('*, doctors(specialization, profiles(full_name))').eq('patient_id', g.user.id).order('appointment_date').execute()
-    
-    # 2. Stats Calculation
-    # Fetch all completed appointments for spending
-    completed = client.table('appointments').select('*, doctors(consultation_fee)').eq('patient_id', g.user.id).eq('status', 'completed').execute()
-    total_spent = sum([a['doctors']['consultation_fee'] or 0 for a in completed.data])
-    
-    # Fetch total prescriptions
-    all_appts = client.table('appointments').select('id').eq('patient_id', g.user.id).execute()
-    a_ids = [x['id'] for x in all_appts.data]
-    rx_count = 0
-    if a_ids:
-        rx_res = client.table('prescriptions').select('id', count='exact').in_('appointment_id', a_ids).execute()
-        rx_count = rx_res.count if rx_res.count is not None else len(rx_res.data)
+    # Appointments, total spent and prescription count in one round-trip (see patient_dashboard() in schema.sql)
+    res = client.rpc('patient_dashboard', {}).execute()
+    summary = res.data or {}
 
     return render_template('patient_dashboard.html', 
-                           appointments=appointments.data, 
+                           appointments=summary.get('appointments', []), 
                            user=g.user,
-                           total_spent=total_spent,
-                           prescriptions_count=rx_count)
+                           total_spent=summary.get('total_spent', 0),
+                           prescriptions_count=summary.get('prescriptions_count', 0))
 
 @patient_bp.route('/doctors')
 @login_required
 @role_required('patient')
 def view_doctors():
     client = get_authenticated_client(g.access_token)
-    
-    # Filter out self if logged in as doctor
-    doctors = client.table('doctors').select('*, profiles(full_name)').neq('id', g.user.id).execute()
-    return render_template('doctors_list.html', doctors=doctors.data)
+    directory = get_directory(client)
+
+    # Unchanged directory: 304 without rendering; otherwise the cards are rendered
+    # once per directory version and shared by every patient
+    def build():
+        # Filter out self if logged in as doctor
+        listed = any(d['id'] == g.user.id for d in directory['doctors'])
+        doctors = [d for d in directory['doctors'] if d['id'] != g.user.id]
+        key = f"doctor_cards:{directory['version']}" + (f":{g.user.id}" if listed else "")
+        cards = cached_fragment(key, lambda: render_template('doctor_cards.html', doctors=doctors))
+        return render_template('doctors_list.html', doctor_cards=cards)
+
+    etag = version_etag('patient.view_doctors', directory['version'], g.user.id)
+    return conditional_response(etag, directory['updated_at'], build)
 
 @patient_bp.route('/appointments/history')
 @login_required
 @role_required('patient')
 def appointment_history():
     client = get_authenticated_client(g.access_token)
-    # Fetch all appointments
-    history = client.table('appointments').select('*').eq('patient_id', g.user.id).execute()
-    return jsonify(history.data)
+
+    # Keyset pagination on (appointment_date, id); ?format=ndjson streams every page
+    def build_query(after):
+        query = select_for(client, 'appointments', 'patient.appointment_history').eq('patient_id', g.user.id)
+        return keyset_after(query, ('appointment_date', 'id'), after).order('appointment_date').order('id')
+
+    return paginated_response(build_query, lambda row: [row['appointment_date'], row['id']], (timestamp_key, uuid_key))
 
 @patient_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
@@ -69,7 +77,7 @@ def profile():
         return render_template('patient_profile.html', user=g.user, profile=data, message="Profile updated")
 
     # GET
-    response = client.table('profiles').select('*').eq('id', g.user.id).limit(1).execute()
+    response = select_for(client, 'profiles', 'patient.profile').eq('id', g.user.id).limit(1).execute()
     profile_data = response.data[0] if response.data else {}
     # If no profile yet, pass empty dict
     return render_template('patient_profile.html', user=g.user, profile=profile_data)
@@ -79,29 +87,42 @@ def profile():
 @role_required('patient')
 def prescriptions():
     client = get_authenticated_client(g.access_token)
-    data = client.table('prescriptions').select('*, appointments(appointment_date, doctors(profiles(full_name)))').execute()
+    # Scoped to the caller explicitly rather than leaving the whole table to RLS
+    data = select_for(client, 'prescriptions', 'patient.prescriptions').eq('appointments.patient_id', g.user.id).order('created_at', desc=True).execute()
     return render_template('patient_prescriptions.html', prescriptions=data.data)
 
+@patient_bp.route('/prescriptions/search')
+@login_required
+@role_required('patient')
+def search_prescriptions():
+    client = get_authenticated_client(g.access_token)
+    return search_response(client, g.user.id)
+
+@patient_bp.route('/medications')
+@login_required
+@role_required('patient')
+def medications():
+    client = get_authenticated_client(g.access_token)
+    return medication_timeline(client, g.user.id)
+
 @patient_bp.route('/billing')
 @login_required
 @role_required('patient')
 def billing():
     client = get_authenticated_client(g.access_token)
+    try:
+        cursor = decode_cursor(request.args.get('cursor'), (timestamp_key, uuid_key))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    appointments = client.table('appointments').select(
-        '*, doctors(consultation_fee, profiles(full_name))'
-    ).eq('status', 'completed').eq('patient_id', g.user.id).execute()
-    
-    total_bill = 0
-    billing_items = []
-    
-    for appt in appointments.data:
-        fee = appt['doctors']['consultation_fee'] or 0
-        total_bill += fee
-        billing_items.append({
-            "date": appt['appointment_date'],
-            "doctor": appt['doctors']['profiles']['full_name'],
-            "fee": fee
-        })
-        
-    return render_template('patient_billing.html', items=billing_items, total=total_bill)
+    # Ledger entries carry the fee charged at completion; totals and monthly
+    # rollups are maintained alongside them (see billing_ledger in schema.sql)
+    entries, next_cursor, totals, monthly = billing_overview(client, 'patient', 'patient.billing', cursor, page_size())
+
+    billing_items = [{
+        "date": entry['billed_at'],
+        "doctor": entry['doctors']['profiles']['full_name'] if entry.get('doctors') else '',
+        "fee": entry['fee']
+    } for entry in entries]
+
+    return render_template('patient_billing.html', items=billing_items, total=totals['amount'], monthly=monthly, next_cursor=next_cursor)
@@ -0,0 +1,127 @@
+import os
+import time
+import bisect
+import datetime
+from app.cache import get_cache
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+SLOT_MINUTES = int(os.environ.get("SLOT_MINUTES", 30))
+SLOT_CACHE_TTL = int(os.environ.get("SLOT_CACHE_TTL", 300))
+MAX_SLOT_DAYS = 14
+# Days kept in one doctor's cache entry; the most recently computed win
+SLOT_CACHE_MAX_DAYS = 4 * MAX_SLOT_DAYS
+
+def parse_timestamp(value):
+    # PostgREST returns ISO strings, older rows may use a trailing 'Z'
+    dt = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt
+
+def schedule_slots(doctor, day, slot_minutes=SLOT_MINUTES):
+    """
+    Expand a doctor's weekly schedule into fixed-length slot start times for one day.
+    Times are treated as UTC, matching how datetime-local bookings are stored.
+    """
+    if WEEKDAYS[day.weekday()] not in (doctor.get('available_days') or []):
+        return []
+    if not doctor.get('start_time') or not doctor.get('end_time'):
+        return []
+
+    start = datetime.datetime.combine(day, datetime.time.fromisoformat(doctor['start_time']), tzinfo=datetime.timezone.utc)
+    end = datetime.datetime.combine(day, datetime.time.fromisoformat(doctor['end_time']), tzinfo=datetime.timezone.utc)
+    step = datetime.timedelta(minutes=slot_minutes)
+
+    slots = []
+    while start + step <= end:
+        slots.append(start)
+        start += step
+    return slots
+
+class BusyIndex:
+    """
+    Sorted index of booked intervals for one doctor. Each booking occupies one
+    slot length from its start, so overlap is a single bisect.
+    """
+
+    def __init__(self, starts, slot_minutes=SLOT_MINUTES):
+        self.starts = sorted(starts)
+        self.length = datetime.timedelta(minutes=slot_minutes)
+
+    def overlaps(self, start, end):
+        i = bisect.bisect_left(self.starts, end)
+        return i > 0 and self.starts[i - 1] + self.length > start
+
+def slot_key(doctor_id):
+    return f"slots:{doctor_id}"
+
+def invalidate_slots(doctor_id):
+    """Drop cached availability after a booking, cancellation or schedule change."""
+    if not doctor_id:
+        return
+    # One entry per doctor, so a single delete reaches every worker sharing CACHE_URL
+    get_cache().invalidate(slot_key(doctor_id))
+
+def fresh_days(entry, now):
+    """Days of a cached doctor entry computed within the TTL, as {YYYY-MM-DD: [computed_at, slots]}."""
+    return {day: value for day, value in (entry or {}).items() if value[0] > now - SLOT_CACHE_TTL}
+
+def available_slots(client, doctors, start_day, days):
+    """
+    Free slots per doctor per day, as {doctor_id: {YYYY-MM-DD: [iso, ...]}}.
+    Each doctor's days live in one shared cache entry, read for all doctors
+    in one round trip; days missing from it are recomputed with one
+    doctor_busy_slots() call covering all of them.
+    """
+    day_list = [start_day + datetime.timedelta(days=i) for i in range(days)]
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cache = get_cache()
+
+    doctor_ids = [str(doctor['id']) for doctor in doctors]
+    cached = cache.get_many([slot_key(doctor_id) for doctor_id in doctor_ids])
+
+    result = {}
+    entries = {}
+    missing = {}
+    for doctor, doctor_id in zip(doctors, doctor_ids):
+        entries[doctor_id] = fresh_days(cached.get(slot_key(doctor_id)), now.timestamp())
+        result[doctor_id] = {}
+        for day in day_list:
+            entry = entries[doctor_id].get(day.isoformat())
+            if entry is None:
+                missing.setdefault(doctor_id, (doctor, []))[1].append(day)
+            else:
+                result[doctor_id][day.isoformat()] = entry[1]
+
+    if missing:
+        range_start = datetime.datetime.combine(day_list[0], datetime.time.min, tzinfo=datetime.timezone.utc)
+        range_end = datetime.datetime.combine(day_list[-1] + datetime.timedelta(days=1), datetime.time.min, tzinfo=datetime.timezone.utc)
+        busy_res = client.rpc('doctor_busy_slots', {
+            "p_doctor_ids": list(missing.keys()),
+            "p_from": range_start.isoformat(),
+            "p_to": range_end.isoformat()
+        }).execute()
+
+        busy = {}
+        for row in busy_res.data or []:
+            busy.setdefault(str(row['doctor_id']), []).append(parse_timestamp(row['appointment_date']))
+
+        step = datetime.timedelta(minutes=SLOT_MINUTES)
+        computed_at = time.time()
+        for doctor_id, (doctor, missing_days) in missing.items():
+            index = BusyIndex(busy.get(doctor_id, []))
+            entry = entries[doctor_id]
+            for day in missing_days:
+                free = [s.isoformat() for s in schedule_slots(doctor, day) if not index.overlaps(s, s + step)]
+                entry[day.isoformat()] = [computed_at, free]
+                result[doctor_id][day.isoformat()] = free
+            kept = sorted(entry.items(), key=lambda item: item[1][0])[-SLOT_CACHE_MAX_DAYS:]
+            cache.set(slot_key(doctor_id), dict(kept), SLOT_CACHE_TTL)
+
+    # Past slots are filtered on read so cached days stay valid all day
+    cutoff = now.isoformat()
+    for per_day in result.values():
+        for day, slots in per_day.items():
+            per_day[day] = [s for s in slots if s > cutoff]
+    return result
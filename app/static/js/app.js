@@ -1,69 +1,119 @@
-// Initialize Supabase correctly without variable shadowing
-const sb = supabase.createClient(SUPABASE_URL, SUPABASE_KEY);
-
-// If we have an auth token, set it in the client
-if (typeof AUTH_TOKEN !== 'undefined' && AUTH_TOKEN) {
-  // In v2, we set the token manually in headers or use setSession
-  sb.auth.setSession({
-    access_token: AUTH_TOKEN,
-    refresh_token: '' // Not strictly needed for a single session view
-  });
+// Live appointment updates
+// Only the changes that concern this user reach the page, which is patched in
+// place instead of being reloaded. gevent workers push them over /events; sync
+// workers can't hold a stream open, so the page polls /events/recent instead and
+// works out the changes from the previous answer.
+if (typeof USER_ID !== 'undefined' && USER_ID) {
+  if (LIVE_UPDATES && typeof EventSource !== 'undefined') {
+    const events = new EventSource('/events');
+    events.addEventListener('appointment', (e) => handleAppointmentChange(JSON.parse(e.data)));
+  } else if (POLL_SECONDS > 0) {
+    pollAppointments(null);
+  }
 }
 
-// Realtime Subscriptions
-if (typeof USER_ID !== 'undefined' && USER_ID) {
-  const channel = sb
-    .channel('db-changes')
-    .on(
-      'postgres_changes',
-      {
-        event: 'INSERT',
-        schema: 'public',
-        table: 'appointments'
-      },
-      (payload) => {
-        const newRecord = payload.new;
-
-        // If I am a doctor, and this new appointment is for ME
-        if (typeof USER_ROLE !== 'undefined' && USER_ROLE === 'doctor') {
-          if (newRecord.doctor_id === USER_ID) {
-            showNotification("🔔 New Appointment Request Received!");
-            refreshDashboard();
-          }
-        }
+function handleAppointmentChange(change) {
+  // If I am a doctor, and this is a new appointment for ME
+  if (USER_ROLE === 'doctor' && change.event === 'insert' && change.doctor_id === USER_ID) {
+    showNotification("🔔 New Appointment Request Received!");
+  }
 
-        // If I am a patient, and my appointment status changed
-        // (This would need a 'UPDATE' listener, let's keep it simple for now as requested)
-      }
-    )
-    .on(
-      'postgres_changes',
-      {
-        event: 'UPDATE',
-        schema: 'public',
-        table: 'appointments'
-      },
-      (payload) => {
-        const oldRecord = payload.old;
-        const newRecord = payload.new;
-
-        if (typeof USER_ROLE !== 'undefined' && USER_ROLE === 'patient') {
-          if (newRecord.patient_id === USER_ID && newRecord.status !== oldRecord.status) {
-            showNotification(`📅 Appointment status updated to: ${newRecord.status}`);
-            refreshDashboard();
+  // If I am a patient, and my appointment status changed
+  if (USER_ROLE === 'patient' && change.event === 'update' && change.patient_id === USER_ID
+      && change.status !== change.old_status) {
+    showNotification(`📅 Appointment status updated to: ${change.status}`);
+  }
+
+  applyAppointmentChange(change);
+}
+
+function pollAppointments(known) {
+  const next = (seen) => setTimeout(() => pollAppointments(seen), POLL_SECONDS * 1000);
+  if (document.hidden) {
+    next(known);
+    return;
+  }
+  fetch('/events/recent', { headers: { 'Accept': 'application/json' } })
+    .then((res) => (res.ok ? res.json() : Promise.reject(res.status)))
+    .then((body) => {
+      const seen = new Map(body.data.map((row) => [row.id, row]));
+      // The first answer is the baseline; later ones are compared against it
+      if (known) {
+        seen.forEach((row, id) => {
+          const before = known.get(id);
+          if (!before) {
+            handleAppointmentChange({ ...row, event: 'insert' });
+          } else if (before.status !== row.status || before.appointment_date !== row.appointment_date) {
+            handleAppointmentChange({ ...row, event: 'update', old_status: before.status });
           }
-        }
+        });
       }
-    )
-    .subscribe();
+      next(seen);
+    })
+    .catch(() => next(known));
+}
+
+function applyAppointmentChange(change) {
+  let row = document.querySelector(`tr[data-appointment-id="${change.id}"]`);
+
+  if (!row && change.event === 'insert') {
+    row = insertAppointmentRow(change);
+  }
+  if (row) {
+    patchAppointmentRow(row, change);
+  }
+
+  // Stat cards tagged with data-stat follow the status counts
+  if (change.event === 'insert') {
+    bumpStat('total', 1);
+    bumpStat(change.status, 1);
+  } else if (change.old_status && change.old_status !== change.status) {
+    bumpStat(change.old_status, -1);
+    bumpStat(change.status, 1);
+  }
 }
 
-function refreshDashboard() {
-  if (window.location.pathname.includes('dashboard')) {
-    // Subtle refresh or prompt
-    console.log("Data changed, refreshing in 3 seconds...");
-    setTimeout(() => window.location.reload(), 3000);
+function insertAppointmentRow(change) {
+  const template = document.getElementById('appointment-row-template');
+  if (!template) return null;
+  const target = document.querySelector(template.dataset.target);
+  if (!target) return null;
+
+  const row = template.content.querySelector('tr').cloneNode(true);
+  row.dataset.appointmentId = change.id;
+  row.querySelectorAll('.batch-select').forEach(el => { el.value = change.id; });
+  setField(row, 'patient_name', change.patient_name || '');
+  setField(row, 'initials', (change.patient_name || '').slice(0, 2));
+  target.prepend(row);
+  return row;
+}
+
+function patchAppointmentRow(row, change) {
+  setField(row, 'appointment_date', String(change.appointment_date).replace('T', ' '));
+
+  const status = row.querySelector('[data-field="status"]');
+  if (status) {
+    status.textContent = change.status;
+    status.className = `status-${change.status}`;
   }
+
+  // Action groups are shown only for the statuses they apply to
+  row.querySelectorAll('[data-show-when]').forEach(el => {
+    const visible = el.dataset.showWhen.split(' ').includes(change.status);
+    el.style.display = visible ? '' : 'none';
+    if (!visible) el.querySelectorAll('input[type="checkbox"]').forEach(box => { box.checked = false; });
+  });
+}
+
+function setField(row, name, value) {
+  const el = row.querySelector(`[data-field="${name}"]`);
+  if (el) el.textContent = value;
+}
+
+function bumpStat(name, delta) {
+  document.querySelectorAll(`[data-stat="${name}"]`).forEach(el => {
+    el.textContent = Math.max((parseInt(el.textContent, 10) || 0) + delta, 0);
+  });
 }
 
 function showNotification(message) {
@@ -87,4 +137,4 @@ function showNotification(message) {
   }, 5000);
 }
 
-console.log("Supabase Realtime Initialized for", USER_ROLE);
+console.log("Live updates initialized for", USER_ROLE);
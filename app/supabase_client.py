@@ -1,7 +1,15 @@
 import os
-from supabase import create_client, Client
+import queue
+import threading
+import httpx
+from app.metrics import start_upstream_timer, record_upstream_call, UPSTREAM_HOOKS
 
-def init_supabase() -> Client:
+# Clients are created on first use in each worker process, never at import time,
+# so nothing holding sockets or threads is inherited across gunicorn's fork
+# (including with --preload). The supabase/postgrest packages are imported at
+# the same point to keep `import app` cheap.
+
+def init_supabase():
     """
     Initialize Supabase client using environment variables.
     Works for both local development and Railway production.
@@ -14,7 +22,124 @@ def init_supabase() -> Client:
         # Clear error message without mentioning .env files
         raise RuntimeError("Supabase configuration missing: SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in Environment Variables.")
     
-    return create_client(url, key)
+    from supabase import create_client, ClientOptions
+
+    # Instrumented session so GoTrue calls show up in /metrics and Server-Timing
+    http_client = httpx.Client(http2=True, follow_redirects=True, event_hooks=UPSTREAM_HOOKS)
+    return create_client(url, key, options=ClientOptions(httpx_client=http_client))
+
+class ClientPool:
+    """
+    Bounded per-worker pool of PostgREST clients.
+    All clients share one keep-alive httpx session, so TLS handshakes are paid
+    once per connection instead of once per request. The user's JWT is set on
+    checkout and removed again on release.
+    """
+
+    def __init__(self, url, key, size=10):
+        self.rest_url = f"{url}/rest/v1"
+        self.key = key
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self.stats = {
+            "pool_hits": 0,
+            "pool_misses": 0,
+            "http_requests": 0,
+            "connections_opened": 0,
+        }
+        self.http = httpx.Client(
+            base_url=self.rest_url,
+            http2=True,
+            follow_redirects=True,
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=size * 2, max_keepalive_connections=size, keepalive_expiry=60),
+            event_hooks={
+                "request": [self._track_request, start_upstream_timer],
+                "response": [record_upstream_call],
+            },
+        )
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _trace(self, event_name, info):
+        # httpcore only emits connect_tcp when no idle keep-alive connection was available
+        if event_name == "connection.connect_tcp.complete":
+            self._count("connections_opened")
+
+    def _track_request(self, request):
+        self._count("http_requests")
+        request.extensions["trace"] = self._trace
+
+    def _new_client(self):
+        from postgrest import SyncPostgrestClient
+        return SyncPostgrestClient(
+            self.rest_url,
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "apiKey": self.key,
+            },
+            http_client=self.http,
+        )
+
+    def acquire(self, token):
+        try:
+            client = self._idle.get_nowait()
+            self._count("pool_hits")
+        except queue.Empty:
+            client = self._new_client()
+            self._count("pool_misses")
+        client.auth(token)
+        return client
+
+    def release(self, client):
+        client.headers.pop("Authorization", None)
+        try:
+            self._idle.put_nowait(client)
+        except queue.Full:
+            pass
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+        data["connections_reused"] = max(data["http_requests"] - data["connections_opened"], 0)
+        data["idle_clients"] = self._idle.qsize()
+        return data
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_client_pool() -> ClientPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                url = os.environ.get("SUPABASE_URL")
+                key = os.environ.get("SUPABASE_SERVICE_KEY") or os.environ.get("SUPABASE_KEY")
+                if not url or not key:
+                    raise RuntimeError("Supabase configuration missing: SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in Environment Variables.")
+                size = int(os.environ.get("SUPABASE_POOL_SIZE", 10))
+                _pool = ClientPool(url, key, size=size)
+    return _pool
+
+_supabase = None
+_supabase_lock = threading.Lock()
+
+def get_supabase():
+    """The process-wide Supabase client (used for GoTrue auth calls)."""
+    global _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                _supabase = init_supabase()
+    return _supabase
+
+def _reset_after_fork():
+    global _supabase, _supabase_lock, _pool, _pool_lock
+    _supabase, _supabase_lock = None, threading.Lock()
+    _pool, _pool_lock = None, threading.Lock()
 
-# Initialize global supabase client
-supabase = init_supabase()
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,6 +1,6 @@
 from functools import wraps
 from flask import request, redirect, url_for, g
-from app.supabase_client import supabase
+from app.auth_cache import get_token_verifier
 
 def login_required(f):
     @wraps(f)
@@ -10,15 +10,15 @@ def login_required(f):
             return redirect(url_for('auth.login'))
 
         try:
-            # Verify the user using the token
-            user_response = supabase.auth.get_user(access_token)
-            if not user_response or not user_response.user:
+            # Verify the user using the token (locally/cached, remote get_user as fallback)
+            user = get_token_verifier().verify(access_token)
+            if not user:
                  return redirect(url_for('auth.login'))
             
-            g.user = user_response.user
+            g.user = user
             g.access_token = access_token
             # Specifically extract role for easy access in views and role_required
-            g.user_role = user_response.user.user_metadata.get('role', 'patient')
+            g.user_role = user.user_metadata.get('role', 'patient')
 
         except Exception as e:
             print(f"Auth Error: {e}")
@@ -42,17 +42,16 @@ def role_required(required_role):
     return decorator
 
 def get_authenticated_client(token):
-    import os
-    from supabase import create_client
-    
-    url = os.environ.get("SUPABASE_URL")
-    key = os.environ.get("SUPABASE_SERVICE_KEY") or os.environ.get("SUPABASE_KEY")
-    
-    if not url or not key:
-        print(f"DEBUG: Missing Supabase config in get_authenticated_client. URL: {bool(url)}, Key: {bool(key)}")
-        raise RuntimeError("Supabase configuration missing in get_authenticated_client")
-        
-    client = create_client(url, key)
-    client.postgrest.auth(token)
+    from app.supabase_client import get_client_pool
+
+    # Reuse a pooled client (and its keep-alive connections); released in teardown
+    client = get_client_pool().acquire(token)
+    g.setdefault('pooled_clients', []).append(client)
     return client
 
+def release_authenticated_clients(exception=None):
+    from app.supabase_client import get_client_pool
+
+    clients = g.pop('pooled_clients', [])
+    for client in clients:
+        get_client_pool().release(client)
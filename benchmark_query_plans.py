@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import statistics
+from dotenv import load_dotenv
+import psycopg2
+
+# Seeds a scratch Postgres (schema.sql loaded, plus the Supabase auth schema /
+# authenticated role) with realistic volumes, then times EXPLAIN ANALYZE for every
+# query the blueprints issue: first without the indexes from the "Indexes for the
+# hot filters" section of schema.sql, then with them. Each query runs as the
+# superuser (RLS bypassed) and as the authenticated role (RLS applied), so the
+# policy overhead shows up as its own column. Statements run inside functions
+# (search, timeline, dashboards) are captured too when auto_explain can be
+# loaded, so the indexes they use are listed next to each timing.
+#
+# Never point this at a real project: it drops and recreates indexes and inserts
+# benchmark users. Seeding is skipped when the benchmark rows already exist.
+#
+# Usage: DATABASE_URL=postgresql://postgres@localhost/shm_bench python benchmark_query_plans.py [doctors] [appointments]
+# Set BENCHMARK_OUTPUT=results.json to also save the timings and plans.
+
+load_dotenv()
+
+dsn = os.getenv("DATABASE_URL")
+DOCTORS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+APPOINTMENTS = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+PATIENTS = max(APPOINTMENTS // 20, 1)
+RUNS = int(os.getenv("BENCHMARK_RUNS", 5))
+OUTPUT = os.getenv("BENCHMARK_OUTPUT")
+
+# Indexes under test, as defined in schema.sql
+INDEXES = [
+    "appointments_doctor_patient_idx",
+    "appointments_patient_date_idx",
+    "appointments_doctor_completed_idx",
+    "appointments_patient_completed_idx",
+    "prescriptions_appointment_id_idx",
+    "prescriptions_created_idx",
+    "prescriptions_medicine_names_trgm_idx",
+    "prescriptions_diagnosis_trgm_idx",
+]
+
+def bench_id(name):
+    # Same derivation as md5(name)::uuid in the seed SQL
+    h = hashlib.md5(name.encode()).hexdigest()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+SEED_SQL = """
+set session_replication_role = replica;
+
+insert into auth.users (id)
+select md5('bench-patient-' || i)::uuid from generate_series(1, %(patients)s) i
+union all
+select md5('bench-doctor-' || i)::uuid from generate_series(1, %(doctors)s) i
+union all
+select md5('bench-admin-1')::uuid;
+
+insert into public.profiles (id, full_name, role, medical_history)
+select md5('bench-patient-' || i)::uuid, 'Patient ' || i, 'patient',
+       case when i %% 3 = 0 then 'Hypertension' end
+from generate_series(1, %(patients)s) i
+union all
+select md5('bench-doctor-' || i)::uuid, 'Dr. Bench ' || i, 'doctor', null
+from generate_series(1, %(doctors)s) i
+union all
+select md5('bench-admin-1')::uuid, 'Bench Admin', 'admin', null;
+
+insert into public.doctors (id, specialization, available_days, start_time, end_time, consultation_fee)
+select md5('bench-doctor-' || i)::uuid,
+       (array['General', 'Cardiology', 'Dermatology', 'Pediatrics', 'Orthopedics'])[1 + i %% 5],
+       array['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'],
+       '09:00', '17:00', 300 + (i %% 5) * 100
+from generate_series(1, %(doctors)s) i;
+
+-- One appointment per doctor per day, spread back and forward from today. The
+-- day (i / doctors) is mixed into patient and status, so patients see several
+-- doctors and every doctor has a mix of statuses.
+insert into public.appointments (patient_id, doctor_id, appointment_date, status, notes)
+select md5('bench-patient-' || (1 + (i::bigint * 7919 + i / %(doctors)s) %% %(patients)s))::uuid,
+       md5('bench-doctor-' || (1 + i %% %(doctors)s))::uuid,
+       slot,
+       case when slot > now() then (array['pending', 'confirmed'])[1 + (i + i / %(doctors)s) %% 2]
+            when (i + i / %(doctors)s) %% 10 = 0 then 'cancelled'
+            else 'completed' end,
+       'benchmark'
+from (
+  select i, date_trunc('day', now()) - interval '900 days'
+            + (i / %(doctors)s) * interval '1 day'
+            + (9 + i %% 8) * interval '1 hour' as slot
+  from generate_series(0, %(appointments)s - 1) i
+) s;
+
+insert into public.prescriptions (appointment_id, medicines, diagnosis, created_at)
+select id,
+       jsonb_build_array(jsonb_build_object(
+         'name', (array['Paracetamol', 'Ibuprofen', 'Amoxicillin', 'Metformin', 'Salbutamol', 'Atorvastatin'])[1 + (random() * 5)::int],
+         'dosage', '500mg', 'frequency', 'Twice a day')),
+       (array['Fever', 'Migraine', 'Type 2 diabetes', 'Asthma', 'Hypertension', 'Bronchitis'])[1 + (random() * 5)::int],
+       appointment_date
+from public.appointments
+where status = 'completed' and notes = 'benchmark' and random() < 0.5;
+
+insert into public.billing_ledger (appointment_id, patient_id, doctor_id, fee, billed_at)
+select a.id, a.patient_id, a.doctor_id, d.consultation_fee, a.appointment_date
+from public.appointments a
+join public.doctors d on d.id = a.doctor_id
+where a.status = 'completed' and a.notes = 'benchmark';
+
+set session_replication_role = origin;
+
+-- Triggers were off while seeding, so rebuild the summary counters
+truncate public.hospital_counters, public.appointment_daily_stats,
+  public.appointment_doctor_status_stats,
+  public.billing_totals, public.billing_monthly;
+insert into public.hospital_counters (name, value)
+select 'total_patients', count(*) from public.profiles where role = 'patient'
+union all
+select 'total_doctors', count(*) from public.doctors;
+insert into public.appointment_daily_stats (day, doctor_id, status, appointments)
+select (appointment_date at time zone 'utc')::date, doctor_id, coalesce(status, 'pending'), count(*)
+from public.appointments
+group by 1, 2, 3;
+insert into public.appointment_doctor_status_stats (doctor_id, status, appointments)
+select doctor_id, coalesce(status, 'pending'), count(*) from public.appointments group by 1, 2;
+insert into public.billing_totals (role, party_id, amount, entries)
+select 'patient', patient_id, sum(fee), count(*) from public.billing_ledger group by patient_id
+union all
+select 'doctor', doctor_id, sum(fee), count(*) from public.billing_ledger group by doctor_id;
+insert into public.billing_monthly (role, party_id, month, amount, entries)
+select 'patient', patient_id, date_trunc('month', billed_at at time zone 'utc')::date, sum(fee), count(*)
+from public.billing_ledger group by 2, 3
+union all
+select 'doctor', doctor_id, date_trunc('month', billed_at at time zone 'utc')::date, sum(fee), count(*)
+from public.billing_ledger group by 2, 3;
+"""
+
+# (name, role, sql, has_user_filter). Queries the app only scopes through RLS
+# are not run with RLS bypassed, since that would read every row.
+QUERIES = [
+    ("patient.dashboard", "patient", "select public.patient_dashboard()", True),
+    ("patient.appointment_history", "patient",
+     "select * from public.appointments where patient_id = %(patient)s order by appointment_date, id limit 51", True),
+    ("patient.prescriptions", "patient",
+     "select p.*, a.appointment_date, pr.full_name from public.prescriptions p"
+     " left join public.appointments a on a.id = p.appointment_id"
+     " left join public.profiles pr on pr.id = a.doctor_id", False),
+    ("patient.billing", "patient",
+     "select l.id, l.billed_at, l.fee, p.full_name from public.billing_ledger l left join public.profiles p on p.id = l.doctor_id"
+     " where l.patient_id = %(patient)s order by l.billed_at desc, l.id desc limit 51", True),
+    ("doctor.dashboard_stats", "doctor", "select public.doctor_dashboard_stats()", True),
+    ("doctor.dashboard_page", "doctor",
+     "select a.id, a.appointment_date, a.status, p.full_name from public.appointments a"
+     " left join public.profiles p on p.id = a.patient_id"
+     " where a.doctor_id = %(doctor)s order by a.appointment_date desc limit 10", True),
+    ("doctor.patients", "doctor", "select public.doctor_patient_roster()", True),
+    ("doctor.patient_details.appointments", "doctor",
+     "select * from public.appointments where doctor_id = %(doctor)s and patient_id = %(patient)s"
+     " order by appointment_date desc", True),
+    ("doctor.patient_details.prescriptions", "doctor",
+     "select p.* from public.prescriptions p join public.appointments a on a.id = p.appointment_id"
+     " where a.doctor_id = %(doctor)s and a.patient_id = %(patient)s order by p.created_at desc", True),
+    ("doctor.transactions", "doctor",
+     "select l.id, l.billed_at, l.fee, p.full_name from public.billing_ledger l left join public.profiles p on p.id = l.patient_id"
+     " where l.doctor_id = %(doctor)s order by l.billed_at desc, l.id desc limit 51", True),
+    ("appointment.slots", "patient",
+     "select * from public.doctor_busy_slots(array[%(doctor)s]::uuid[], now(), now() + interval '14 days')", True),
+    ("appointment.book", "patient",
+     "select public.book_appointment(%(doctor)s, date_trunc('day', now()) + interval '3 years', 'benchmark')", True),
+    ("prescriptions.search", "doctor", "select public.search_prescriptions(p_limit => 51)", True),
+    ("prescriptions.search_patient", "doctor",
+     "select public.search_prescriptions(p_patient_id => %(patient)s, p_limit => 51)", True),
+    ("prescriptions.search_medicine", "patient", "select public.search_prescriptions(p_medicine => 'metfor', p_limit => 51)", True),
+    ("prescriptions.search_diagnosis", "doctor",
+     "select public.search_prescriptions(p_diagnosis => 'asthma', p_from => now() - interval '1 year', p_limit => 51)", True),
+    ("prescriptions.medication_timeline", "doctor", "select public.patient_medication_timeline(%(patient)s)", True),
+    ("admin.hospital_summary", "admin", "select public.hospital_summary()", True),
+    ("admin.doctor_availability", "admin",
+     "select d.*, p.full_name from public.doctors d left join public.profiles p on p.id = d.id order by d.id", True),
+]
+
+def enable_nested_plans(conn):
+    """Log the plans of statements run inside functions to this client, if auto_explain is available."""
+    try:
+        with conn.cursor() as cur:
+            cur.execute("load 'auto_explain'")
+            cur.execute("set auto_explain.log_min_duration = 0")
+            cur.execute("set auto_explain.log_nested_statements = on")
+            cur.execute("set auto_explain.log_format = json")
+            cur.execute("set client_min_messages = log")
+        conn.commit()
+        return True
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"auto_explain unavailable, plans inside functions are not shown: {e}".strip())
+        return False
+
+def nested_plans(conn):
+    plans = []
+    for notice in conn.notices:
+        if "plan:" not in notice:
+            continue
+        plan = json.loads(notice.split("plan:", 1)[1])
+        if not plan.get("Query Text", "").lstrip().lower().startswith("explain"):
+            plans.append(plan)
+    conn.notices.clear()
+    return plans
+
+def index_names(plan):
+    names = set()
+    if isinstance(plan, dict):
+        if "Index Name" in plan:
+            names.add(plan["Index Name"])
+        for value in plan.values():
+            names |= index_names(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            names |= index_names(value)
+    return names
+
+def explain(conn, sql, params, user_id, rls):
+    """Median planning + execution time in ms over RUNS runs, plus the last plan and the plans run inside it."""
+    timings = []
+    plan = None
+    with conn.cursor() as cur:
+        for run in range(RUNS + 1):
+            conn.notices.clear()
+            if rls:
+                cur.execute("set local role authenticated")
+            cur.execute("select set_config('request.jwt.claim.sub', %s, true)", (user_id,))
+            cur.execute("explain (analyze, buffers, format json) " + sql, params)
+            plan = cur.fetchone()[0][0]
+            conn.rollback()
+            if run:  # first run warms the cache
+                timings.append(plan["Planning Time"] + plan["Execution Time"])
+    return statistics.median(timings), dict(plan, nested=nested_plans(conn))
+
+def analyze(conn):
+    conn.commit()
+    conn.autocommit = True
+    conn.cursor().execute("analyze")
+    conn.autocommit = False
+
+def run_suite(conn, params, phase):
+    results = {}
+    for name, role, sql, has_user_filter in QUERIES:
+        user_id = params[role]
+        entry = {}
+        if has_user_filter:
+            entry["no_rls_ms"], entry["no_rls_plan"] = explain(conn, sql, params, user_id, rls=False)
+        entry["rls_ms"], entry["rls_plan"] = explain(conn, sql, params, user_id, rls=True)
+        results[name] = entry
+        indexes = ", ".join(sorted(index_names(entry["rls_plan"]))) or "no index"
+        print(f"  {phase:<7}{name:<40}{entry['rls_ms']:>10.2f} ms  [{indexes}]")
+    return results
+
+if not dsn:
+    print("Error: DATABASE_URL is missing")
+    exit(1)
+
+conn = psycopg2.connect(dsn)
+cur = conn.cursor()
+enable_nested_plans(conn)
+
+cur.execute("select indexname, indexdef from pg_indexes where schemaname = 'public' and indexname = any(%s)", (INDEXES,))
+index_defs = dict(cur.fetchall())
+missing = [name for name in INDEXES if name not in index_defs]
+if missing:
+    print(f"Error: load the current schema.sql first (missing indexes: {', '.join(missing)})")
+    exit(1)
+
+params = {
+    "patient": bench_id("bench-patient-1"),
+    "doctor": bench_id("bench-doctor-1"),
+    "admin": bench_id("bench-admin-1"),
+}
+
+print(f"--- Query plan benchmark: {DOCTORS} doctors, {PATIENTS} patients, {APPOINTMENTS} appointments ---")
+
+for name in INDEXES:
+    cur.execute(f"drop index public.{name}")
+conn.commit()
+
+try:
+    cur.execute("select count(*) from public.doctors where id = %s", (params["doctor"],))
+    if cur.fetchone()[0] == 0:
+        started = time.perf_counter()
+        cur.execute(SEED_SQL, {"patients": PATIENTS, "doctors": DOCTORS, "appointments": APPOINTMENTS})
+        conn.commit()
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+    else:
+        print("Benchmark data already present, skipping seed")
+
+    # A patient who has seen the sample doctor, for the patient details queries
+    cur.execute("select patient_id from public.appointments where doctor_id = %s limit 1", (params["doctor"],))
+    params["patient"] = str(cur.fetchone()[0])
+
+    analyze(conn)
+    before = run_suite(conn, params, "before")
+finally:
+    conn.rollback()
+    for name in INDEXES:
+        cur.execute(index_defs[name])
+    conn.commit()
+
+analyze(conn)
+after = run_suite(conn, params, "after")
+
+def fmt(value):
+    return f"{value:>10.2f}" if value is not None else f"{'-':>10}"
+
+print()
+print(f"{'query':<40}{'before':>10}{'+RLS':>10}{'after':>10}{'+RLS':>10}{'speedup':>9}")
+for name, _, _, _ in QUERIES:
+    b, a = before[name], after[name]
+    speedup = b["rls_ms"] / a["rls_ms"] if a["rls_ms"] else 0
+    print(f"{name:<40}{fmt(b.get('no_rls_ms'))}{fmt(b['rls_ms'])}{fmt(a.get('no_rls_ms'))}{fmt(a['rls_ms'])}{speedup:>8.1f}x")
+print("(ms, median of planning + execution; +RLS runs as the authenticated role)")
+
+if OUTPUT:
+    with open(OUTPUT, "w") as f:
+        json.dump({
+            "doctors": DOCTORS, "patients": PATIENTS, "appointments": APPOINTMENTS, "runs": RUNS,
+            "before": before, "after": after
+        }, f, indent=2)
+    print(f"Saved timings and plans to {OUTPUT}")
+
+conn.close()
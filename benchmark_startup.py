@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import threading
+import statistics
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import httpx
+import jwt
+
+# Startup cost of the app, against a local stub of the Supabase REST API:
+#   1. import time of wsgi (app factory included) in fresh interpreters
+#   2. gunicorn with and without GUNICORN_PRELOAD=1: time from launch to the
+#      first response, and per worker the latency of its first request (clients
+#      are created on first use) against its warm requests
+#
+# Usage: python benchmark_startup.py [workers] [import_runs]
+
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+IMPORT_RUNS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+JWT_SECRET = "loadtest-secret-loadtest-secret-0000"
+PATH = "/patient/appointments/history"
+
+class StubBackend(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def handle_call(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        body = json.dumps([]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = handle_call
+    do_POST = handle_call
+
+    def log_message(self, *args):
+        pass
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return True
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    return False
+
+def base_env(backend_url):
+    return dict(
+        os.environ,
+        SUPABASE_URL=backend_url,
+        SUPABASE_KEY="loadtest-key",
+        SUPABASE_JWT_SECRET=JWT_SECRET,
+        AUTH_VERIFY_MODE="local",
+    )
+
+def measure_import(env):
+    code = "import time; t = time.perf_counter(); import wsgi; print(time.perf_counter() - t)"
+    timings = []
+    for _ in range(IMPORT_RUNS):
+        out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        timings.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return timings
+
+def run_server(preload, env, token):
+    port = free_port()
+    log = tempfile.NamedTemporaryFile(suffix=".log", delete=False)
+    log.close()
+    env = dict(env, WEB_CONCURRENCY=str(WORKERS), PORT=str(port), GUNICORN_PRELOAD="1" if preload else "0")
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "--access-logfile", log.name, "--access-logformat", "%(p)s %(U)s %(s)s %(D)s", "wsgi:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        if not wait_for(base + "/auth/login"):
+            print(f"❌ preload={preload}: server did not start")
+            return None
+        ready = time.perf_counter() - started
+
+        # Concurrent waves so every sync worker serves several requests
+        def hit():
+            with httpx.Client(base_url=base, cookies={"access_token": token}, timeout=30) as client:
+                for _ in range(5):
+                    client.get(PATH)
+        threads = [threading.Thread(target=hit) for _ in range(WORKERS * 2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        per_worker = {}
+        with open(log.name) as f:
+            for line in f:
+                pid, path, status, micros = line.split()
+                if path == PATH and status == "200":
+                    per_worker.setdefault(pid, []).append(int(micros) / 1000)
+        first = [timings[0] for timings in per_worker.values()]
+        warm = [t for timings in per_worker.values() for t in timings[1:]]
+        return {
+            "preload": preload,
+            "ready": ready * 1000,
+            "workers": len(per_worker),
+            "first": statistics.median(first) if first else 0,
+            "first_max": max(first) if first else 0,
+            "warm": statistics.median(warm) if warm else 0,
+        }
+    finally:
+        server.terminate()
+        server.wait()
+        os.unlink(log.name)
+
+backend = ThreadingHTTPServer(("127.0.0.1", free_port()), StubBackend)
+threading.Thread(target=backend.serve_forever, daemon=True).start()
+env = base_env(f"http://127.0.0.1:{backend.server_address[1]}")
+
+token = jwt.encode({
+    "sub": "00000000-0000-0000-0000-000000000001",
+    "email": "loadtest@example.com",
+    "aud": "authenticated",
+    "exp": int(time.time()) + 3600,
+    "user_metadata": {"role": "patient"},
+}, JWT_SECRET, algorithm="HS256")
+
+timings = measure_import(env)
+print(f"--- import wsgi ({IMPORT_RUNS} fresh interpreters) ---")
+print(f"median {statistics.median(timings):.0f}ms  min {min(timings):.0f}ms  max {max(timings):.0f}ms")
+
+print(f"\n--- gunicorn, {WORKERS} sync workers, {PATH} ---")
+results = [r for r in (run_server(preload, env, token) for preload in (False, True)) if r]
+print(f"{'preload':<9}{'ready ms':>10}{'workers':>9}{'first req ms':>14}{'worst first':>13}{'warm ms':>9}")
+for r in results:
+    print(f"{str(r['preload']):<9}{r['ready']:>10.0f}{r['workers']:>9}{r['first']:>14.1f}{r['first_max']:>13.1f}{r['warm']:>9.1f}")
+backend.shutdown()
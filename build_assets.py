@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import gzip
+import shutil
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Builds the static assets served at /assets (see app/assets.py): every file in
+# app/static is copied to app/static/dist under a content-hashed name, with
+# .gz and .br (when the brotli package is installed) variants next to it, and
+# manifest.json maps the source name to the hashed one. Run before starting the
+# server (the Procfile does); without a manifest templates fall back to /static.
+#
+# Usage: python build_assets.py
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".html")
+
+def source_files():
+    for root, dirs, files in os.walk(STATIC_DIR):
+        if os.path.abspath(root) == STATIC_DIR and "dist" in dirs:
+            dirs.remove("dist")
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, STATIC_DIR).replace(os.sep, "/"), path
+
+def hashed_name(name, data):
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest}{ext}"
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+def build():
+    # Build next to the live directory and swap, so a running server never sees a half-written dist
+    staging = DIST_DIR + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    manifest = {}
+    for name, path in source_files():
+        with open(path, "rb") as f:
+            data = f.read()
+        target = hashed_name(name, data)
+        manifest[name] = target
+        write(os.path.join(staging, target), data)
+
+        sizes = [f"{len(data)}B"]
+        if name.endswith(COMPRESSIBLE):
+            variants = {"gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = brotli.compress(data, quality=11)
+            for suffix, compressed in variants.items():
+                if len(compressed) < len(data):
+                    write(os.path.join(staging, f"{target}.{suffix}"), compressed)
+                    sizes.append(f"{suffix} {len(compressed)}B")
+        print(f"✅ {name} -> {target} ({', '.join(sizes)})")
+
+    write(os.path.join(staging, "manifest.json"), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    previous = DIST_DIR + ".old"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(DIST_DIR):
+        os.rename(DIST_DIR, previous)
+    os.rename(staging, DIST_DIR)
+    shutil.rmtree(previous, ignore_errors=True)
+
+    if brotli is None:
+        print("⚠️ brotli is not installed (pip install brotli); only gzip variants were written")
+    print(f"✅ {len(manifest)} assets written to {DIST_DIR}")
+
+if __name__ == "__main__":
+    try:
+        build()
+    except OSError as e:
+        print(f"❌ Asset build failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,220 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from dotenv import load_dotenv
+import psycopg2
+from psycopg2.extras import execute_values, Json
+
+# Bulk import/export of appointments, prescriptions, doctors and profiles straight
+# against Postgres (DATABASE_URL), for onboarding a clinic's history or producing
+# extracts without per-row API calls. Files are CSV with a header row, or NDJSON
+# (.ndjson / .jsonl), and are streamed, so memory stays flat at any size.
+#
+# Export uses COPY (CSV) or a server-side cursor (NDJSON):
+#   python bulk_data.py export appointments march.csv --from 2026-03-01 --to 2026-04-01 --status completed
+# Import upserts on id in chunks, committing and checkpointing after each one, so
+# a rerun after a failure resumes where it stopped (--restart to start over):
+#   python bulk_data.py import appointments history.ndjson --chunk-size 5000
+#
+# profiles rows must belong to existing auth users, so import them after the
+# accounts have been created.
+
+load_dotenv()
+
+# Table -> date column used by --from/--to and for export order
+TABLES = {
+    'profiles': 'created_at',
+    'doctors': 'created_at',
+    'appointments': 'appointment_date',
+    'prescriptions': 'created_at',
+}
+
+def table_columns(cur, table):
+    cur.execute("""
+        select column_name, data_type from information_schema.columns
+        where table_schema = 'public' and table_name = %s
+        order by ordinal_position
+    """, (table,))
+    return cur.fetchall()
+
+def is_ndjson(path):
+    return path.endswith('.ndjson') or path.endswith('.jsonl')
+
+class Progress:
+    def __init__(self, label, done=0):
+        self.label = label
+        self.done = done
+        self.started = time.perf_counter()
+        self.counted = 0
+
+    def add(self, rows):
+        self.done += rows
+        self.counted += rows
+        elapsed = time.perf_counter() - self.started
+        rate = self.counted / elapsed if elapsed else 0
+        print(f"  {self.label}: {self.done} rows ({rate:,.0f} rows/s)")
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.counted / elapsed if elapsed else 0
+        print(f"✅ {self.label}: {self.done} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+
+def export_table(conn, table, path, date_from, date_to, status, chunk_size):
+    date_column = TABLES[table]
+    with conn.cursor() as cur:
+        columns = [name for name, _ in table_columns(cur, table)]
+        filters, params = [], []
+        if date_from:
+            filters.append(f"{date_column} >= %s")
+            params.append(date_from)
+        if date_to:
+            filters.append(f"{date_column} < %s")
+            params.append(date_to)
+        if status:
+            if 'status' not in columns:
+                raise ValueError(f"{table} has no status column")
+            filters.append("status = %s")
+            params.append(status)
+        where = f"where {' and '.join(filters)}" if filters else ""
+        query = cur.mogrify(
+            f"select {', '.join(columns)} from public.{table} {where} order by {date_column}, id", params
+        ).decode()
+
+    progress = Progress(f"export {table}")
+    if not is_ndjson(path):
+        with open(path, 'w', newline='') as f, conn.cursor() as cur:
+            cur.copy_expert(f"copy ({query}) to stdout with (format csv, header)", f)
+            progress.add(cur.rowcount)
+    else:
+        with open(path, 'w') as f, conn.cursor(name=f'export_{table}') as cur:
+            cur.itersize = chunk_size
+            cur.execute(f"select row_to_json(t)::text from ({query}) t")
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                f.writelines(row[0] + '\n' for row in rows)
+                progress.add(len(rows))
+    progress.finish()
+
+def read_records(path):
+    """Yield one dict per record; CSV empty fields become None."""
+    if is_ndjson(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                yield {k: (v if v != '' else None) for k, v in row.items()}
+
+def chunks(records, size, skip):
+    chunk = []
+    for i, record in enumerate(records):
+        if i < skip:
+            continue
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def load_checkpoint(path, table, restart):
+    checkpoint = path + '.checkpoint'
+    if restart or not os.path.exists(checkpoint):
+        return 0
+    with open(checkpoint) as f:
+        state = json.load(f)
+    if state.get('table') != table:
+        raise ValueError(f"{checkpoint} belongs to an import into {state.get('table')}; use --restart")
+    return state['rows_done']
+
+def save_checkpoint(path, table, rows_done):
+    checkpoint = path + '.checkpoint'
+    with open(checkpoint + '.tmp', 'w') as f:
+        json.dump({'table': table, 'rows_done': rows_done}, f)
+    os.replace(checkpoint + '.tmp', checkpoint)
+
+def import_table(conn, table, path, chunk_size, restart):
+    with conn.cursor() as cur:
+        types = dict(table_columns(cur, table))
+
+    skip = load_checkpoint(path, table, restart)
+    if skip:
+        print(f"Resuming after {skip} rows (checkpoint {path}.checkpoint)")
+
+    progress = Progress(f"import {table}", done=skip)
+    columns = None
+    for chunk in chunks(read_records(path), chunk_size, skip):
+        if columns is None:
+            unknown = [c for c in chunk[0] if c not in types]
+            if unknown:
+                raise ValueError(f"Unknown {table} columns: {', '.join(unknown)}")
+            if 'id' not in chunk[0]:
+                raise ValueError("Records need an id column to upsert on")
+            columns = list(chunk[0])
+            # Explicit casts let CSV text and NDJSON values share one statement
+            template = '(' + ', '.join(f"%s::{types[c] if types[c] != 'ARRAY' else 'text[]'}" for c in columns) + ')'
+            updates = ', '.join(f"{c} = excluded.{c}" for c in columns if c != 'id')
+            statement = (f"insert into public.{table} ({', '.join(columns)}) values %s "
+                         f"on conflict (id) do update set {updates}")
+
+        values = []
+        for record in chunk:
+            row = []
+            for c in columns:
+                value = record.get(c)
+                if types[c] == 'jsonb' and value is not None and not isinstance(value, str):
+                    value = Json(value)
+                row.append(value)
+            values.append(row)
+
+        with conn.cursor() as cur:
+            # Skip the per-row realtime notifications for bulk loads
+            cur.execute("select set_config('shm.bulk_import', 'on', true)")
+            execute_values(cur, statement, values, template=template, page_size=chunk_size)
+        conn.commit()
+        save_checkpoint(path, table, progress.done + len(chunk))
+        progress.add(len(chunk))
+
+    progress.finish()
+    if os.path.exists(path + '.checkpoint'):
+        os.remove(path + '.checkpoint')
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk CSV/NDJSON import and export.")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('table', choices=list(TABLES))
+    parser.add_argument('path', help="CSV file, or .ndjson/.jsonl")
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--from', dest='date_from', help="export: rows on or after this date")
+    parser.add_argument('--to', dest='date_to', help="export: rows before this date")
+    parser.add_argument('--status', help="export: appointments with this status only")
+    parser.add_argument('--restart', action='store_true', help="import: ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    dsn = os.getenv("DATABASE_URL")
+    if not dsn:
+        print("Error: DATABASE_URL is missing")
+        sys.exit(1)
+
+    conn = psycopg2.connect(dsn)
+    try:
+        if args.command == 'export':
+            export_table(conn, args.table, args.path, args.date_from, args.date_to, args.status, args.chunk_size)
+        else:
+            import_table(conn, args.table, args.path, args.chunk_size, args.restart)
+    except (ValueError, psycopg2.Error) as e:
+        conn.rollback()
+        print(f"❌ {args.command} {args.table} failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,24 @@
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
-    SUPABASE_URL = os.getenv('SUPABASE_URL')
-    # Check for either key to support different hosting conventions
-    SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_KEY') or os.getenv('SUPABASE_KEY')
-    print(f"Config Initialized: URL={bool(SUPABASE_URL)}, KEY={bool(SUPABASE_KEY)}")
+    SUPABASE_URL = None
+    SUPABASE_KEY = None
+    # Reverse proxies in front of the app (the hosting router is one); their
+    # X-Forwarded-For/-Proto give the client address. 0 when clients connect directly.
+    PROXY_HOPS = 1
+
+    @staticmethod
+    def load():
+        """Read settings (and .env) when the app is created rather than at import."""
+        from dotenv import load_dotenv
+        load_dotenv()
+        Config.SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
+        Config.SUPABASE_URL = os.getenv('SUPABASE_URL')
+        # Check for either key to support different hosting conventions
+        Config.SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_KEY') or os.getenv('SUPABASE_KEY')
+        Config.PROXY_HOPS = int(os.getenv('PROXY_HOPS', 1))
+        print(f"Config Initialized: URL={bool(Config.SUPABASE_URL)}, KEY={bool(Config.SUPABASE_KEY)}")
 
     @staticmethod
     def validate():
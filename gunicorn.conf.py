@@ -0,0 +1,39 @@
+import os
+
+# Serving mode, picked up automatically by `gunicorn wsgi:app` (see Procfile).
+#   SERVING_MODE=sync   one request at a time per worker (default)
+#   SERVING_MODE=gevent cooperative workers: each worker keeps serving other
+#                       requests while one waits on Supabase HTTP calls
+serving_mode = os.environ.get("SERVING_MODE", "sync")
+
+if serving_mode == "gevent":
+    # Patch before the app (httpx sockets, threading locks, the fan-out pool) is imported
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.environ['PORT']}" if "PORT" in os.environ else "127.0.0.1:8000"
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+
+# GUNICORN_PRELOAD=1 imports wsgi:app once in the master so workers fork with the
+# app (and its imported modules) already built. Supabase clients, the fan-out
+# pool, the token verifier and the event listener are created per worker on
+# first use and reset after fork, so nothing is shared across processes.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "0") == "1"
+
+if preload_app:
+    # The client libraries are otherwise imported on a worker's first request
+    import postgrest, supabase  # noqa: F401
+
+if serving_mode == "gevent":
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get("GEVENT_CONNECTIONS", 100))
+    # Let every in-flight request hold its own pooled PostgREST client and connection
+    os.environ.setdefault("SUPABASE_POOL_SIZE", str(worker_connections))
+    # Patched threads are greenlets, so give run_concurrently room for every in-flight
+    # request's queries (up to 3 each) instead of one 8-slot queue shared by all
+    os.environ.setdefault("FANOUT_WORKERS", str(worker_connections * 3))
+    # Shed with 503 past half the connections, keeping the rest for event streams and health checks
+    os.environ.setdefault("MAX_IN_FLIGHT", str(max(worker_connections // 2, 1)))
+else:
+    worker_class = "sync"
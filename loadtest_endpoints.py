@@ -0,0 +1,336 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import datetime
+import threading
+import subprocess
+from dotenv import load_dotenv
+import httpx
+import psycopg2
+from local_supabase import DEFAULT_JWT_SECRET, LOCAL_PASSWORD, local_id
+
+# End-to-end load test: the app under gunicorn against the local Supabase
+# stand-in (local_supabase.py), driven by virtual patients and doctors running a
+# weighted mix of requests. Reports throughput and p50/p95/p99 per endpoint, and
+# can gate on a saved baseline so blueprint changes are measured, not guessed.
+#
+# Prepare a scratch database once:
+#   DATABASE_URL=postgresql://postgres@localhost/shm_local python local_supabase.py --init --seed 20 500 20000
+# Then:
+#   python loadtest_endpoints.py --duration 30 --users 20 --output before.json
+#   python loadtest_endpoints.py --duration 30 --users 20 --baseline before.json
+#
+# Bookings and prescriptions write to the database, so reseed (or use a fresh
+# copy) when comparing runs over long periods.
+
+load_dotenv()
+
+# (endpoint, weight) per role; every virtual user logs in before its first request
+PATIENT_MIX = [("patient.dashboard", 40), ("patient.doctors", 25), ("appointment.book", 25), ("auth.login", 10)]
+DOCTOR_MIX = [("doctor.dashboard", 65), ("doctor.prescribe", 25), ("auth.login", 10)]
+EXPECTED_STATUS = {
+    "auth.login": (302,),
+    "patient.doctors": (200, 304),
+    "appointment.book": (201, 409),
+    "appointment.book (burst)": (201, 409),
+}
+NOISE_FLOOR_MS = 5
+# Turned away by admission control (app/admission.py): reported, not counted as errors
+SHED_STATUS = (429, 503)
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.shed = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok, shed=False):
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append(seconds * 1000)
+            if shed:
+                self.shed[endpoint] = self.shed.get(endpoint, 0) + 1
+            elif not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+def percentile(sorted_values, p):
+    index = max(int(len(sorted_values) * p / 100 + 0.999999) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return True
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    return False
+
+def future_slot():
+    day = datetime.date.today() + datetime.timedelta(days=random.randint(30, 365))
+    return f"{day.isoformat()}T{random.randint(9, 16):02d}:{random.choice(('00', '30'))}:00+00:00"
+
+class VirtualUser:
+    def __init__(self, base, role, number, doctor_ids, recorder, targets):
+        self.client = httpx.Client(base_url=base, timeout=60)
+        self.role = role
+        self.email = f"{role}{number}@example.com"
+        self.user_id = local_id(f"local-{role}-{number}")
+        self.doctor_ids = doctor_ids
+        self.recorder = recorder
+        self.targets = targets
+        self.etags = {}
+
+    def get(self, path):
+        # Revalidate like a browser: send back the last ETag seen for the page
+        headers = {"If-None-Match": self.etags[path]} if path in self.etags else {}
+        response = self.client.get(path, headers=headers)
+        if "ETag" in response.headers:
+            self.etags[path] = response.headers["ETag"]
+        return response
+
+    def timed(self, endpoint, send):
+        started = time.perf_counter()
+        try:
+            status = send().status_code
+        except httpx.HTTPError:
+            status = None
+        ok = status in EXPECTED_STATUS.get(endpoint, (200,))
+        self.recorder.record(endpoint, time.perf_counter() - started, ok, status in SHED_STATUS)
+        return status
+
+    def login(self):
+        return self.timed("auth.login", lambda: self.client.post("/auth/login", data={
+            "email": self.email, "password": LOCAL_PASSWORD, "role": self.role}))
+
+    def run(self, endpoint):
+        if endpoint == "auth.login":
+            self.login()
+        elif endpoint == "patient.dashboard":
+            self.timed(endpoint, lambda: self.client.get("/patient/dashboard"))
+        elif endpoint == "patient.doctors":
+            self.timed(endpoint, lambda: self.get("/patient/doctors"))
+        elif endpoint == "appointment.book":
+            self.timed(endpoint, lambda: self.client.post("/appointment/book", json={
+                "doctor_id": random.choice(self.doctor_ids), "appointment_date": future_slot(), "notes": "load test"}))
+        elif endpoint == "doctor.dashboard":
+            self.timed(endpoint, lambda: self.client.get("/doctor/dashboard"))
+        elif endpoint == "doctor.prescribe":
+            with self.targets["lock"]:
+                pending = self.targets.get(self.user_id) or []
+                appointment_id = pending.pop() if pending else None
+            if appointment_id is None:
+                return self.run("doctor.dashboard")
+            self.timed(endpoint, lambda: self.client.post(f"/doctor/prescribe/{appointment_id}", json={
+                "diagnosis": "Seasonal flu",
+                "medicines": [{"name": "Paracetamol", "dosage": "500mg", "frequency": "Twice a day"}]}))
+
+    def loop(self, deadline, think):
+        mix = PATIENT_MIX if self.role == "patient" else DOCTOR_MIX
+        endpoints, weights = zip(*mix)
+        if self.login() != 302:
+            return
+        while time.time() < deadline:
+            self.run(random.choices(endpoints, weights)[0])
+            if think:
+                time.sleep(think)
+
+def burst_loop(base, patient_numbers, doctor_ids, recorder, deadline, interval, results):
+    """Every interval, several patients book the same slot at the same moment."""
+    clients = []
+    for number in patient_numbers:
+        client = httpx.Client(base_url=base, timeout=60)
+        client.post("/auth/login", data={"email": f"patient{number}@example.com", "password": LOCAL_PASSWORD, "role": "patient"})
+        clients.append(client)
+
+    while time.time() + interval < deadline:
+        time.sleep(interval)
+        payload = {"doctor_id": random.choice(doctor_ids), "appointment_date": future_slot(), "notes": "burst"}
+        barrier = threading.Barrier(len(clients))
+        statuses = []
+
+        def book(client):
+            barrier.wait()
+            started = time.perf_counter()
+            try:
+                status = client.post("/appointment/book", json=payload).status_code
+            except httpx.HTTPError:
+                status = None
+            recorder.record("appointment.book (burst)", time.perf_counter() - started, status in (201, 409), status in SHED_STATUS)
+            statuses.append(status)
+
+        threads = [threading.Thread(target=book, args=(client,)) for client in clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        results["bursts"] += 1
+        if statuses.count(201) > 1:
+            results["double_bookings"] += 1
+    for client in clients:
+        client.close()
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        endpoints[endpoint] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(endpoint, 0),
+            "shed": recorder.shed.get(endpoint, 0),
+            "throughput": len(ordered) / elapsed,
+            "p50": percentile(ordered, 50),
+            "p95": percentile(ordered, 95),
+            "p99": percentile(ordered, 99),
+        }
+    return endpoints
+
+def compare(endpoints, baseline, max_regression):
+    failures = []
+    for endpoint, stats in endpoints.items():
+        if stats["errors"] > stats["requests"] * 0.01:
+            failures.append(f"{endpoint}: {stats['errors']} errors in {stats['requests']} requests")
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before:
+            continue
+        limit = before["p95"] * (1 + max_regression)
+        if stats["p95"] > limit and stats["p95"] - before["p95"] > NOISE_FLOOR_MS:
+            failures.append(f"{endpoint}: p95 {stats['p95']:.0f}ms vs {before['p95']:.0f}ms baseline")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against the local Supabase stand-in.")
+    parser.add_argument("--duration", type=int, default=30, help="seconds")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--doctor-share", type=float, default=0.25, help="fraction of users who are doctors")
+    parser.add_argument("--think-ms", type=int, default=0, help="pause between a user's requests")
+    parser.add_argument("--burst-size", type=int, default=10, help="patients booking one slot at once (0 disables)")
+    parser.add_argument("--burst-interval", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--serving-mode", choices=["sync", "gevent"], default="sync")
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against; exits 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed p95 increase per endpoint")
+    args = parser.parse_args()
+
+    dsn = os.getenv("DATABASE_URL")
+    if not dsn:
+        print("Error: DATABASE_URL is missing")
+        sys.exit(1)
+
+    conn = psycopg2.connect(dsn)
+    with conn.cursor() as cur:
+        cur.execute("""
+            select count(*) filter (where email like 'doctor%%'), count(*) filter (where email like 'patient%%')
+            from auth.users where email like '%%@example.com'
+        """)
+        seeded_doctors, seeded_patients = cur.fetchone()
+    doctors = max(1, round(args.users * args.doctor_share)) if args.doctor_share > 0 else 0
+    patients = args.users - doctors
+    if seeded_doctors < max(doctors, 1) or seeded_patients < patients + args.burst_size:
+        print("Error: not enough seeded accounts; run local_supabase.py --init --seed <doctors> <patients> <appointments>")
+        sys.exit(1)
+
+    doctor_ids = [local_id(f"local-doctor-{i}") for i in range(1, seeded_doctors + 1)]
+    # Open appointments each virtual doctor can prescribe for
+    targets = {"lock": threading.Lock()}
+    with conn.cursor() as cur:
+        cur.execute("""
+            select doctor_id::text, id::text from public.appointments
+            where doctor_id = any(%s::uuid[]) and status in ('pending', 'confirmed')
+            order by appointment_date desc
+        """, ([local_id(f"local-doctor-{i}") for i in range(1, doctors + 1)],))
+        for doctor_id, appointment_id in cur.fetchall():
+            targets.setdefault(doctor_id, []).append(appointment_id)
+    conn.close()
+
+    jwt_secret = os.getenv("SUPABASE_JWT_SECRET") or DEFAULT_JWT_SECRET
+    backend_port, app_port = free_port(), free_port()
+    backend = subprocess.Popen(
+        [sys.executable, "local_supabase.py", "--port", str(backend_port), "--pool-size", str(max(args.users, 20))],
+        env=dict(os.environ, SUPABASE_JWT_SECRET=jwt_secret), stdout=subprocess.DEVNULL,
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        env=dict(
+            os.environ,
+            SUPABASE_URL=f"http://127.0.0.1:{backend_port}",
+            SUPABASE_KEY="local-anon-key",
+            SUPABASE_JWT_SECRET=jwt_secret,
+            AUTH_VERIFY_MODE="local",
+            SERVING_MODE=args.serving_mode,
+            WEB_CONCURRENCY=str(args.workers),
+            PORT=str(app_port),
+        ),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{app_port}"
+        if not wait_for(f"http://127.0.0.1:{backend_port}/") or not wait_for(base + "/auth/login"):
+            print("❌ backend or app did not start")
+            sys.exit(1)
+
+        print(f"--- {args.duration}s, {args.users} users ({patients} patients, {doctors} doctors), "
+              f"{args.workers} {args.serving_mode} workers, bursts of {args.burst_size} every {args.burst_interval:g}s ---")
+        recorder = Recorder()
+        burst_results = {"bursts": 0, "double_bookings": 0}
+        users = [VirtualUser(base, "patient", i, doctor_ids, recorder, targets) for i in range(1, patients + 1)]
+        users += [VirtualUser(base, "doctor", i, doctor_ids, recorder, targets) for i in range(1, doctors + 1)]
+
+        started = time.perf_counter()
+        deadline = time.time() + args.duration
+        threads = [threading.Thread(target=user.loop, args=(deadline, args.think_ms / 1000)) for user in users]
+        if args.burst_size:
+            burst_patients = range(patients + 1, patients + args.burst_size + 1)
+            threads.append(threading.Thread(target=burst_loop, args=(
+                base, burst_patients, doctor_ids, recorder, deadline, args.burst_interval, burst_results)))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+        backend.terminate()
+        backend.wait()
+
+    endpoints = summarize(recorder, elapsed)
+    total = sum(stats["requests"] for stats in endpoints.values())
+    print(f"{'endpoint':<26}{'requests':>9}{'errors':>8}{'shed':>6}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint, stats in endpoints.items():
+        print(f"{endpoint:<26}{stats['requests']:>9}{stats['errors']:>8}{stats['shed']:>6}{stats['throughput']:>8.1f}"
+              f"{stats['p50']:>9.0f}{stats['p95']:>9.0f}{stats['p99']:>9.0f}")
+    print(f"{'total':<26}{total:>9}{sum(s['errors'] for s in endpoints.values()):>8}"
+          f"{sum(s['shed'] for s in endpoints.values()):>6}{total / elapsed:>8.1f}")
+    if args.burst_size:
+        print(f"Bursts: {burst_results['bursts']}, double bookings: {burst_results['double_bookings']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "elapsed": elapsed, "bursts": burst_results, "endpoints": endpoints}, f, indent=2)
+        print(f"Saved {args.output}")
+
+    failures = [] if burst_results["double_bookings"] == 0 else [f"{burst_results['double_bookings']} double-booked bursts"]
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += compare(endpoints, json.load(f), args.max_regression)
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    if args.baseline:
+        print(f"✅ No endpoint regressed more than {args.max_regression:.0%} at p95")
+
+if __name__ == "__main__":
+    main()
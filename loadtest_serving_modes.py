@@ -0,0 +1,155 @@
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import httpx
+import jwt
+
+# Compares the sync and gevent serving modes (see gunicorn.conf.py) with one
+# gunicorn worker each, against a local stub of the Supabase REST API that adds
+# a fixed latency to every call. Reports throughput, latency and how many
+# requests a single worker had in flight at the backend at once.
+#
+# Usage: python loadtest_serving_modes.py [requests] [concurrency] [backend_latency_ms]
+
+TOTAL = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+LATENCY = (int(sys.argv[3]) if len(sys.argv) > 3 else 100) / 1000.0
+JWT_SECRET = "loadtest-secret-loadtest-secret-0000"
+
+class StubBackend(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def handle_call(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        with StubBackend.lock:
+            StubBackend.in_flight += 1
+            StubBackend.peak = max(StubBackend.peak, StubBackend.in_flight)
+        time.sleep(LATENCY)
+        with StubBackend.lock:
+            StubBackend.in_flight -= 1
+
+        if "/rpc/patient_dashboard" in self.path:
+            payload = {"appointments": [], "total_spent": 0, "prescriptions_count": 0}
+        else:
+            payload = []
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = handle_call
+    do_POST = handle_call
+
+    def log_message(self, *args):
+        pass
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(url, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return True
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    return False
+
+def run_mode(mode, backend_url, token):
+    port = free_port()
+    env = dict(
+        os.environ,
+        SERVING_MODE=mode,
+        WEB_CONCURRENCY="1",
+        PORT=str(port),
+        SUPABASE_URL=backend_url,
+        SUPABASE_KEY="loadtest-key",
+        SUPABASE_JWT_SECRET=JWT_SECRET,
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        if not wait_for(base + "/auth/login"):
+            print(f"❌ {mode}: server did not start")
+            return None
+
+        StubBackend.peak = 0
+        latencies = []
+        errors = 0
+        counter = iter(range(TOTAL))
+        lock = threading.Lock()
+
+        def worker():
+            nonlocal errors
+            with httpx.Client(base_url=base, cookies={"access_token": token}, timeout=60) as client:
+                while True:
+                    with lock:
+                        if next(counter, None) is None:
+                            return
+                    started = time.perf_counter()
+                    try:
+                        ok = client.get("/patient/dashboard").status_code == 200
+                    except httpx.HTTPError:
+                        ok = False
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+                        errors += 0 if ok else 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(CONCURRENCY)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            "mode": mode,
+            "throughput": TOTAL / elapsed,
+            "p50": latencies[len(latencies) // 2] * 1000,
+            "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            "peak_in_flight": StubBackend.peak,
+            "errors": errors,
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+backend = ThreadingHTTPServer(("127.0.0.1", free_port()), StubBackend)
+threading.Thread(target=backend.serve_forever, daemon=True).start()
+backend_url = f"http://127.0.0.1:{backend.server_address[1]}"
+
+token = jwt.encode({
+    "sub": "00000000-0000-0000-0000-000000000001",
+    "email": "loadtest@example.com",
+    "aud": "authenticated",
+    "exp": int(time.time()) + 3600,
+    "user_metadata": {"role": "patient"},
+}, JWT_SECRET, algorithm="HS256")
+
+print(f"--- {TOTAL} requests to /patient/dashboard, concurrency {CONCURRENCY}, backend latency {LATENCY * 1000:.0f}ms, 1 worker ---")
+results = [r for r in (run_mode(mode, backend_url, token) for mode in ("sync", "gevent")) if r]
+
+print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'in flight':>11}{'errors':>8}")
+for r in results:
+    print(f"{r['mode']:<8}{r['throughput']:>10.1f}{r['p50']:>10.0f}{r['p95']:>10.0f}{r['peak_in_flight']:>11}{r['errors']:>8}")
+backend.shutdown()
@@ -0,0 +1,812 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import secrets
+import argparse
+import threading
+from collections import namedtuple
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+from dotenv import load_dotenv
+import jwt
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+# Offline stand-in for a Supabase project: a plain local Postgres (DATABASE_URL)
+# with schema.sql loaded, behind a small HTTP layer that answers the PostgREST
+# (/rest/v1) and GoTrue (/auth/v1) calls this app makes. Requests run as the
+# anon/authenticated role with the JWT claims set, so RLS policies, triggers and
+# RPCs behave as they do on Supabase. Only the subset of PostgREST the app uses
+# is implemented: selects with embedded resources (incl. !inner), eq/neq/gt/gte/
+# lt/lte/like/ilike/is/in/cs/cd filters, or()/and() trees, order, limit/offset,
+# single(), insert/upsert/update/delete and rpc.
+#
+#   python local_supabase.py --init                  # load local_supabase.sql + schema.sql into an empty database
+#   python local_supabase.py --seed 20 500 20000     # doctors, patients, appointments
+#   python local_supabase.py --port 54321            # serve
+#
+# Then run the app with SUPABASE_URL=http://127.0.0.1:54321, any SUPABASE_KEY and
+# the same SUPABASE_JWT_SECRET. Seeded accounts are doctor<N>@example.com,
+# patient<N>@example.com and admin@example.com, all with LOCAL_PASSWORD.
+
+load_dotenv()
+
+DEFAULT_PORT = 54321
+DEFAULT_JWT_SECRET = "local-supabase-jwt-secret-0000000000"
+LOCAL_PASSWORD = "password123"
+ACCESS_TOKEN_TTL = 3600
+# Far cheaper than GoTrue's bcrypt, so logins don't dominate a load test
+PASSWORD_ITERATIONS = 10000
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+OPERATORS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=",
+             "like": "like", "ilike": "ilike", "cs": "@>", "cd": "<@", "ov": "&&"}
+API_ROLES = ("anon", "authenticated", "service_role")
+
+Column = namedtuple("Column", "alias name cast")
+Embed = namedtuple("Embed", "alias table hint inner items")
+Function = namedtuple("Function", "name arg_names arg_types defaults returns_rows returns_void single_row")
+
+class ApiError(Exception):
+    def __init__(self, status, code, message, details=None, hint=None):
+        super().__init__(message)
+        self.status = status
+        self.body = {"code": code, "message": message, "details": details, "hint": hint}
+
+def from_database_error(e, role):
+    """Map a Postgres error to PostgREST's status code and error body."""
+    code = e.pgcode or ""
+    if code in ("23503", "23505", "40001"):
+        status = 409
+    elif code == "42501":
+        status = 401 if role == "anon" else 403
+    elif code in ("42883", "42P01", "P0002"):
+        status = 404
+    elif code == "25006":
+        status = 405
+    elif code[:2] in ("08", "53", "57"):
+        status = 503
+    elif code[:2] == "XX":
+        status = 500
+    else:
+        status = 400
+    diag = e.diag
+    return ApiError(status, code, diag.message_primary or str(e).strip(), diag.message_detail, diag.message_hint)
+
+def quote(name):
+    if not IDENTIFIER.match(name or ""):
+        raise ApiError(400, "PGRST100", f"Invalid identifier: {name!r}")
+    return f'"{name}"'
+
+def split_top(text):
+    """Split on commas outside parentheses and double quotes."""
+    parts, current, depth, quoted, escaped = [], [], 0, False, False
+    for ch in text:
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+def unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+def parse_select(text):
+    items = []
+    for part in split_top(text):
+        if part.endswith(")") and "(" in part:
+            head, inner = part.split("(", 1)
+            alias, _, target = head.rpartition(":")
+            table, _, hint = target.partition("!")
+            inner_join = False
+            if hint in ("inner", "left"):
+                inner_join, hint = hint == "inner", ""
+            elif "!" in hint:
+                hint, _, join = hint.partition("!")
+                inner_join = join == "inner"
+            items.append(Embed(alias or table, table, hint or None, inner_join, parse_select(inner[:-1])))
+        else:
+            field, _, cast = part.partition("::")
+            alias, _, name = field.rpartition(":")
+            items.append(Column(alias or None, name, cast or None))
+    return items
+
+class Catalog:
+    """Tables, single-column foreign keys and functions of the public schema."""
+
+    def __init__(self, conn):
+        with conn.cursor() as cur:
+            cur.execute("""
+                select table_name, column_name from information_schema.columns
+                where table_schema = 'public' order by table_name, ordinal_position
+            """)
+            self.columns = {}
+            for table, column in cur.fetchall():
+                self.columns.setdefault(table, []).append(column)
+
+            cur.execute("""
+                select con.conname, src.relname, sa.attname, dst.relname, da.attname
+                from pg_constraint con
+                join pg_class src on src.oid = con.conrelid
+                join pg_namespace n on n.oid = src.relnamespace
+                join pg_class dst on dst.oid = con.confrelid
+                join pg_attribute sa on sa.attrelid = con.conrelid and sa.attnum = con.conkey[1]
+                join pg_attribute da on da.attrelid = con.confrelid and da.attnum = con.confkey[1]
+                where con.contype = 'f' and n.nspname = 'public' and cardinality(con.conkey) = 1
+            """)
+            self.foreign_keys = cur.fetchall()
+
+            cur.execute("""
+                select c.relname, con.contype, array_agg(a.attname order by k.ord)
+                from pg_constraint con
+                join pg_class c on c.oid = con.conrelid
+                join pg_namespace n on n.oid = c.relnamespace
+                cross join unnest(con.conkey) with ordinality k(attnum, ord)
+                join pg_attribute a on a.attrelid = con.conrelid and a.attnum = k.attnum
+                where n.nspname = 'public' and con.contype in ('p', 'u')
+                group by c.relname, con.conname, con.contype
+            """)
+            self.primary_keys = {}
+            self.unique = set()
+            for table, kind, columns in cur.fetchall():
+                if kind == "p":
+                    self.primary_keys[table] = columns
+                if len(columns) == 1:
+                    self.unique.add((table, columns[0]))
+
+            cur.execute("""
+                select p.proname, p.proargnames, p.proargmodes::text[], p.pronargs, p.pronargdefaults,
+                       array(select format_type(t, null) from unnest(p.proargtypes) t),
+                       p.proretset, t.typtype, t.typname
+                from pg_proc p
+                join pg_namespace n on n.oid = p.pronamespace
+                join pg_type t on t.oid = p.prorettype
+                where n.nspname = 'public' and p.prokind = 'f'
+            """)
+            self.functions = {}
+            for name, names, modes, nargs, ndefaults, types, retset, typtype, typname in cur.fetchall():
+                names = names or []
+                if modes:
+                    inputs = [n for n, m in zip(names, modes) if m in ("i", "b", "v")]
+                else:
+                    inputs = names[:nargs]
+                returns_rows = retset or typtype == "c" or typname == "record"
+                self.functions.setdefault(name, []).append(Function(
+                    name, inputs, types, ndefaults, returns_rows, typname == "void", returns_rows and not retset))
+
+    def function(self, name, args):
+        for fn in self.functions.get(name, []):
+            required = fn.arg_names[:len(fn.arg_names) - fn.defaults]
+            if set(args) <= set(fn.arg_names) and set(required) <= set(args):
+                return fn
+        signature = ", ".join(sorted(args))
+        raise ApiError(404, "PGRST202", f"Could not find the function public.{name}({signature}) in the schema cache")
+
+    def relationship(self, parent, target, hint=None):
+        """(parent column, target column, to-many) joining an embedded target to its parent."""
+        candidates = []
+        for name, src, src_column, dst, dst_column in self.foreign_keys:
+            if hint not in (None, name, src_column):
+                continue
+            if src == parent and dst == target:
+                candidates.append((src_column, dst_column, False))
+            elif src == target and dst == parent:
+                candidates.append((dst_column, src_column, (target, src_column) not in self.unique))
+        if not candidates:
+            raise ApiError(400, "PGRST200", f"Could not find a relationship between '{parent}' and '{target}' in the schema cache")
+        if len(candidates) > 1:
+            raise ApiError(300, "PGRST201", f"More than one relationship was found for '{parent}' and '{target}'",
+                           hint=f"Try changing '{target}' to '{target}!<column>'")
+        return candidates[0]
+
+class Compiler:
+    """Builds SQL for one PostgREST request. Values are inlined with literal()."""
+
+    def __init__(self, catalog, literal):
+        self.catalog = catalog
+        self.literal = literal
+
+    def column(self, table, alias, name):
+        if name not in self.catalog.columns[table]:
+            raise ApiError(400, "42703", f"column {table}.{name} does not exist")
+        return f"{alias}.{quote(name)}"
+
+    def condition(self, column, expression):
+        negate = expression.startswith("not.")
+        if negate:
+            expression = expression[4:]
+        op, _, value = expression.partition(".")
+        if op in OPERATORS:
+            value = unquote(value)
+            if op in ("like", "ilike"):
+                value = value.replace("*", "%")
+            sql = f"{column} {OPERATORS[op]} {self.literal(value)}"
+        elif op == "is":
+            if value.lower() not in ("null", "true", "false", "unknown"):
+                raise ApiError(400, "PGRST100", f"Invalid is value: {value}")
+            sql = f"{column} is {value.lower()}"
+        elif op == "in":
+            if not (value.startswith("(") and value.endswith(")")):
+                raise ApiError(400, "PGRST100", f"Invalid in list: {value}")
+            values = [self.literal(unquote(v)) for v in split_top(value[1:-1])]
+            sql = f"{column} in ({', '.join(values)})" if values else "false"
+        else:
+            raise ApiError(400, "PGRST100", f"Unsupported operator: {op}")
+        return f"not ({sql})" if negate else sql
+
+    def logic(self, op, text, table, alias):
+        if not (text.startswith("(") and text.endswith(")")):
+            raise ApiError(400, "PGRST100", f"Invalid logic tree: {text}")
+        terms = []
+        for part in split_top(text[1:-1]):
+            negate = part.startswith("not.")
+            body = part[4:] if negate else part
+            if body.startswith(("and(", "or(")):
+                sub_op, _, rest = body.partition("(")
+                sql = self.logic(sub_op, "(" + rest, table, alias)
+            else:
+                name, _, expression = body.partition(".")
+                sql = self.condition(self.column(table, alias, name), expression)
+            terms.append(f"not ({sql})" if negate else f"({sql})")
+        return "(" + f" {op} ".join(terms) + ")"
+
+    def conditions(self, table, alias, entries):
+        out = []
+        for key, value in entries:
+            if key in ("or", "and"):
+                out.append(self.logic(key, value, table, alias))
+            else:
+                out.append(self.condition(self.column(table, alias, key), value))
+        return out
+
+    def level(self, table, alias, items, filters, path, depth):
+        """Select list and where conditions for one table in the embed tree."""
+        columns = []
+        where = self.conditions(table, alias, filters.get(path, []))
+        for item in items:
+            if isinstance(item, Column):
+                if item.name == "*":
+                    columns.append(f"{alias}.*")
+                    continue
+                expression = self.column(table, alias, item.name)
+                if item.cast:
+                    expression += f"::{quote(item.cast)}"
+                columns.append(f"{expression} as {quote(item.alias or item.name)}")
+                continue
+
+            if item.table not in self.catalog.columns:
+                raise ApiError(400, "PGRST200", f"Could not find a relationship between '{table}' and '{item.table}' in the schema cache")
+            parent_column, target_column, many = self.catalog.relationship(table, item.table, item.hint)
+            child = f"t{depth + 1}"
+            child_columns, child_where = self.level(item.table, child, item.items, filters, path + (item.alias,), depth + 1)
+            join = f"{child}.{quote(target_column)} = {alias}.{quote(parent_column)}"
+            source = f"from public.{quote(item.table)} {child} where " + " and ".join([join] + child_where)
+            if child_columns:
+                inner = f"select {', '.join(child_columns)} {source}"
+                if many:
+                    columns.append(f"(select coalesce(json_agg(_e), '[]') from ({inner}) _e) as {quote(item.alias)}")
+                else:
+                    columns.append(f"(select row_to_json(_e) from ({inner} limit 1) _e) as {quote(item.alias)}")
+            if item.inner:
+                where.append(f"exists (select 1 {source})")
+        return columns, where
+
+    def order_by(self, table, alias, text):
+        terms = []
+        for term in split_top(text):
+            name, *modifiers = term.split(".")
+            sql = self.column(table, alias, name)
+            for modifier in modifiers:
+                if modifier in ("asc", "desc"):
+                    sql += f" {modifier}"
+                elif modifier in ("nullsfirst", "nullslast"):
+                    sql += f" nulls {modifier[5:]}"
+                else:
+                    raise ApiError(400, "PGRST100", f"Invalid order modifier: {modifier}")
+            terms.append(sql)
+        return " order by " + ", ".join(terms)
+
+    def select(self, table, items, source, filters, order=None, limit=None, offset=None):
+        """Rows as a JSON array (text)."""
+        columns, where = self.level(table, "t0", items, filters, (), 0)
+        sql = f"select {', '.join(columns) or 'null'} from {source} t0"
+        if where:
+            sql += " where " + " and ".join(where)
+        if order:
+            sql += self.order_by(table, "t0", order)
+        if limit is not None:
+            sql += f" limit {int(limit)}"
+        if offset is not None:
+            sql += f" offset {int(offset)}"
+        return f"select coalesce(json_agg(_r), '[]')::text from ({sql}) _r"
+
+    def count(self, table, items, source, filters):
+        _, where = self.level(table, "t0", items, filters, (), 0)
+        return f"select count(*) from {source} t0" + ("".join([" where ", " and ".join(where)]) if where else "")
+
+    def write(self, method, table, body, filters, prefer, on_conflict, columns):
+        target = f"public.{quote(table)}"
+        where = self.conditions(table, "t0", filters.get((), []))
+        where_sql = (" where " + " and ".join(where)) if where else ""
+        if method == "DELETE":
+            return f"delete from {target} t0{where_sql}"
+
+        if method == "PATCH":
+            if not isinstance(body, dict) or not body:
+                raise ApiError(400, "PGRST102", "Empty or invalid json")
+            names = [self.column(table, "t0", name).split(".", 1)[1] for name in body]
+            assignments = ", ".join(f"{name} = _j.{name}" for name in names)
+            return (f"update {target} t0 set {assignments} "
+                    f"from json_populate_record(null::{target}, {self.literal(json.dumps(body))}) _j{where_sql}")
+
+        rows = body if isinstance(body, list) else [body]
+        if not rows or not all(isinstance(row, dict) for row in rows):
+            raise ApiError(400, "PGRST102", "Empty or invalid json")
+        if columns:
+            keys = columns.split(",")
+        else:
+            keys = list(dict.fromkeys(key for row in rows for key in row))
+        names = [self.column(table, "t0", key).split(".", 1)[1] for key in keys]
+        sql = (f"insert into {target} as t0 ({', '.join(names)}) select {', '.join(names)} "
+               f"from json_populate_recordset(null::{target}, {self.literal(json.dumps(rows))})")
+        if "resolution=merge-duplicates" in prefer or "resolution=ignore-duplicates" in prefer:
+            conflict = [quote(c) for c in (on_conflict.split(",") if on_conflict else self.catalog.primary_keys.get(table, []))]
+            updates = [f"{name} = excluded.{name}" for name in names if name not in conflict]
+            if "resolution=merge-duplicates" in prefer and updates:
+                sql += f" on conflict ({', '.join(conflict)}) do update set {', '.join(updates)}"
+            else:
+                sql += f" on conflict ({', '.join(conflict)}) do nothing"
+        return sql
+
+    def call(self, fn, args):
+        arguments = []
+        for name, pg_type in zip(fn.arg_names, fn.arg_types):
+            if name not in args:
+                continue
+            value = args[name]
+            if value is None:
+                literal = "null"
+            elif pg_type in ("json", "jsonb") or (isinstance(value, (dict, list)) and not pg_type.endswith("[]")):
+                literal = self.literal(json.dumps(value))
+            else:
+                literal = self.literal(value)
+            arguments.append(f"{quote(name)} => {literal}::{pg_type}")
+        call = f"public.{quote(fn.name)}({', '.join(arguments)})"
+        if fn.returns_rows:
+            return f"select coalesce(json_agg(_r), '[]')::text from {call} _r"
+        if fn.returns_void:
+            return f"select {call}, 'null'"
+        return f"select to_json({call})::text"
+
+def hash_password(password, salt=None, iterations=PASSWORD_ITERATIONS):
+    salt = salt or secrets.token_hex(8)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations).hex()
+    return f"pbkdf2_sha256${iterations}${salt}${digest}"
+
+def check_password(password, stored):
+    try:
+        _, iterations, salt, _ = (stored or "").split("$")
+    except ValueError:
+        return False
+    return secrets.compare_digest(hash_password(password, salt, int(iterations)), stored)
+
+class LocalSupabase:
+    def __init__(self, dsn, jwt_secret, pool_size=20):
+        self.jwt_secret = jwt_secret
+        self.pool = ThreadedConnectionPool(1, pool_size, dsn)
+        # The pool raises instead of waiting when it is exhausted
+        self.slots = threading.BoundedSemaphore(pool_size)
+        self.refresh_tokens = {}
+        self.lock = threading.Lock()
+        conn = self.pool.getconn()
+        try:
+            self.catalog = Catalog(conn)
+            conn.rollback()
+        finally:
+            self.pool.putconn(conn)
+
+    def transaction(self, claims, read_only, work):
+        role = claims.get("role", "anon")
+        with self.slots:
+            conn = self.pool.getconn()
+            try:
+                with conn.cursor() as cur:
+                    if read_only:
+                        cur.execute("set transaction read only")
+                    if role != "postgres":
+                        cur.execute("""
+                            select set_config('role', %s, true), set_config('request.jwt.claims', %s, true),
+                                   set_config('request.jwt.claim.sub', %s, true), set_config('request.jwt.claim.role', %s, true)
+                        """, (role, json.dumps(claims), claims.get("sub", ""), role))
+                    result = work(cur)
+                conn.commit()
+                return result
+            except psycopg2.Error as e:
+                conn.rollback()
+                raise from_database_error(e, role)
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self.pool.putconn(conn, close=bool(conn.closed))
+
+    # PostgREST
+
+    def claims(self, headers):
+        authorization = headers.get("Authorization", "")
+        token = authorization[7:] if authorization.lower().startswith("bearer ") else headers.get("apikey", "")
+        try:
+            claims = jwt.decode(token, self.jwt_secret, algorithms=["HS256"], options={"verify_aud": False})
+        except jwt.ExpiredSignatureError:
+            raise ApiError(401, "PGRST301", "JWT expired")
+        except jwt.PyJWTError:
+            # The API key is not checked: anything that is not a JWT is anon
+            return {"role": "anon"}
+        if claims.get("role", "anon") not in API_ROLES:
+            raise ApiError(401, "PGRST301", f"role \"{claims.get('role')}\" does not exist")
+        return claims
+
+    def rest(self, method, path, params, body, headers):
+        claims = self.claims(headers)
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "rpc":
+            args = body if method == "POST" else dict(params)
+            if not isinstance(args, dict):
+                raise ApiError(400, "PGRST102", "Empty or invalid json")
+            fn = self.catalog.function(parts[1], args)
+
+            def call(cur):
+                cur.execute(Compiler(self.catalog, literal_for(cur)).call(fn, args))
+                result = cur.fetchone()[-1] or "null"
+                if fn.single_row:
+                    rows = json.loads(result)
+                    result = json.dumps(rows[0] if rows else None)
+                return 200, result, {}
+            return self.transaction(claims, method == "GET", call)
+
+        table = parts[0]
+        if len(parts) != 1 or table not in self.catalog.columns:
+            raise ApiError(404, "PGRST205", f"Could not find the table 'public.{table}' in the schema cache")
+        return self.transaction(claims, method in ("GET", "HEAD"),
+                                lambda cur: self.table_request(cur, method, table, params, body, headers))
+
+    def table_request(self, cur, method, table, params, body, headers):
+        compiler = Compiler(self.catalog, literal_for(cur))
+        select, order, limit, offset, on_conflict, columns = "*", None, None, None, None, None
+        filters = {}
+        for key, value in params:
+            if key == "select":
+                select = value or "*"
+            elif key == "order":
+                order = value
+            elif key in ("limit", "offset"):
+                try:
+                    number = int(value)
+                except ValueError:
+                    raise ApiError(400, "PGRST100", f"Invalid {key}: {value}")
+                if key == "limit":
+                    limit = number
+                else:
+                    offset = number
+            elif key == "on_conflict":
+                on_conflict = value
+            elif key == "columns":
+                columns = value
+            else:
+                *path, column = key.split(".")
+                filters.setdefault(tuple(path), []).append((column, value))
+
+        prefer = headers.get("Prefer", "")
+        items = parse_select(select)
+        if method in ("GET", "HEAD"):
+            cur.execute(compiler.select(table, items, f"public.{quote(table)}", filters, order, limit, offset))
+            status = 200
+        elif method in ("POST", "PATCH", "DELETE"):
+            write = compiler.write(method, table, body, filters, prefer, on_conflict, columns)
+            if "return=representation" not in prefer:
+                cur.execute(write)
+                return (201 if method == "POST" else 204), "", {}
+            cur.execute(f"with _w as ({write} returning t0.*) " + compiler.select(table, items, "_w", {}, order))
+            status = 201 if method == "POST" else 200
+        else:
+            raise ApiError(405, "PGRST117", f"Unsupported HTTP method: {method}")
+        payload = cur.fetchone()[0]
+        rows = json.loads(payload)
+
+        response_headers = {}
+        start = offset or 0
+        total = "*"
+        if "count=exact" in prefer and method in ("GET", "HEAD"):
+            cur.execute(compiler.count(table, items, f"public.{quote(table)}", filters))
+            total = cur.fetchone()[0]
+        response_headers["Content-Range"] = f"{start}-{start + len(rows) - 1}/{total}" if rows else f"*/{total}"
+
+        if "application/vnd.pgrst.object+json" in headers.get("Accept", ""):
+            if len(rows) != 1:
+                raise ApiError(406, "PGRST116", "JSON object requested, multiple (or no) rows returned",
+                               f"The result contains {len(rows)} rows")
+            payload = json.dumps(rows[0])
+        return status, payload, response_headers
+
+    # GoTrue
+
+    def user_json(self, row):
+        user_id, email, metadata, created_at, updated_at = row
+        return {
+            "id": str(user_id), "aud": "authenticated", "role": "authenticated", "email": email,
+            "email_confirmed_at": created_at.isoformat(), "phone": "",
+            "app_metadata": {"provider": "email", "providers": ["email"]},
+            "user_metadata": metadata or {}, "identities": [],
+            "created_at": created_at.isoformat(), "updated_at": updated_at.isoformat(),
+        }
+
+    def session(self, user):
+        now = int(time.time())
+        claims = {
+            "sub": user["id"], "aud": "authenticated", "role": "authenticated", "email": user["email"],
+            "iat": now, "exp": now + ACCESS_TOKEN_TTL, "session_id": secrets.token_hex(16),
+            "user_metadata": user["user_metadata"], "app_metadata": user["app_metadata"],
+        }
+        refresh_token = secrets.token_urlsafe(24)
+        with self.lock:
+            self.refresh_tokens[refresh_token] = user["id"]
+        return {
+            "access_token": jwt.encode(claims, self.jwt_secret, algorithm="HS256"),
+            "token_type": "bearer", "expires_in": ACCESS_TOKEN_TTL, "expires_at": now + ACCESS_TOKEN_TTL,
+            "refresh_token": refresh_token, "user": user,
+        }
+
+    def find_user(self, column, value):
+        def query(cur):
+            cur.execute(f"select id, email, raw_user_meta_data, created_at, updated_at, encrypted_password "
+                        f"from auth.users where {column} = %s", (value,))
+            return cur.fetchone()
+        return self.transaction({"role": "postgres"}, True, query)
+
+    def auth(self, method, path, params, body, headers):
+        body = body if isinstance(body, dict) else {}
+        path = path.strip("/")
+        if method == "POST" and path == "signup":
+            email, password = body.get("email"), body.get("password")
+            if not email or not password:
+                raise AuthError(422, "validation_failed", "Signup requires a valid password")
+
+            def create(cur):
+                cur.execute("""
+                    insert into auth.users (email, encrypted_password, raw_user_meta_data) values (%s, %s, %s)
+                    on conflict (email) do nothing
+                    returning id, email, raw_user_meta_data, created_at, updated_at
+                """, (email, hash_password(password), json.dumps(body.get("data") or {})))
+                return cur.fetchone()
+            row = self.transaction({"role": "postgres"}, False, create)
+            if not row:
+                raise AuthError(422, "user_already_exists", "User already registered")
+            return 200, json.dumps(self.session(self.user_json(row))), {}
+
+        if method == "POST" and path == "token":
+            grant_type = dict(params).get("grant_type")
+            if grant_type == "password":
+                row = self.find_user("email", body.get("email"))
+                if not row or not check_password(body.get("password") or "", row[5]):
+                    raise AuthError(400, "invalid_credentials", "Invalid login credentials")
+            elif grant_type == "refresh_token":
+                with self.lock:
+                    user_id = self.refresh_tokens.pop(body.get("refresh_token"), None)
+                row = self.find_user("id", user_id) if user_id else None
+                if not row:
+                    raise AuthError(400, "refresh_token_not_found", "Invalid Refresh Token: Refresh Token Not Found")
+            else:
+                raise AuthError(400, "unsupported_grant_type", f"Unsupported grant type: {grant_type}")
+            return 200, json.dumps(self.session(self.user_json(row[:5]))), {}
+
+        if method == "GET" and path == "user":
+            claims = self.claims(headers)
+            row = self.find_user("id", claims["sub"]) if claims.get("sub") else None
+            if not row:
+                raise AuthError(401, "bad_jwt", "invalid JWT")
+            return 200, json.dumps(self.user_json(row[:5])), {}
+
+        if method == "POST" and path == "logout":
+            return 204, "", {}
+
+        if method == "POST" and path == "recover":
+            return 200, "{}", {}
+
+        raise AuthError(404, "not_found", f"Not found: {method} /auth/v1/{path}")
+
+class AuthError(ApiError):
+    def __init__(self, status, error_code, message):
+        super().__init__(status, error_code, message)
+        self.body = {"code": status, "error_code": error_code, "msg": message}
+
+def literal_for(cur):
+    return lambda value: cur.mogrify("%s", (value,)).decode()
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def handle_call(self):
+        backend = self.server.backend
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                raise ApiError(400, "PGRST102", "Empty or invalid json")
+            params = parse_qsl(url.query, keep_blank_values=True)
+            if url.path.startswith("/rest/v1/"):
+                status, payload, headers = backend.rest(self.command, url.path[len("/rest/v1/"):], params, body, self.headers)
+            elif url.path.startswith("/auth/v1/"):
+                status, payload, headers = backend.auth(self.command, url.path[len("/auth/v1/"):], params, body, self.headers)
+            else:
+                raise ApiError(404, "PGRST125", f"Invalid path: {url.path}")
+        except ApiError as e:
+            status, payload, headers = e.status, json.dumps(e.body), {}
+        except Exception as e:
+            print(f"Local Supabase Error: {e}")
+            status, payload, headers = 500, json.dumps({"code": "XX000", "message": str(e)}), {}
+
+        data = payload.encode() if self.command != "HEAD" else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_HEAD = handle_call
+
+    def log_message(self, *args):
+        pass
+
+def make_server(dsn, jwt_secret, port=DEFAULT_PORT, pool_size=20, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.backend = LocalSupabase(dsn, jwt_secret, pool_size)
+    return server
+
+def local_id(name):
+    # Same derivation as md5(name)::uuid in SEED_SQL
+    h = hashlib.md5(name.encode()).hexdigest()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+# Runs with the triggers on, so counters, rollups and billing are maintained as
+# in production; realtime notifications are skipped like a bulk import.
+SEED_SQL = """
+select set_config('shm.bulk_import', 'on', true);
+
+insert into auth.users (id, email, encrypted_password, raw_user_meta_data)
+select md5('local-doctor-' || i)::uuid, 'doctor' || i || '@example.com', %(password)s,
+       jsonb_build_object('full_name', 'Dr. Local ' || i, 'role', 'doctor')
+from generate_series(1, %(doctors)s) i
+union all
+select md5('local-patient-' || i)::uuid, 'patient' || i || '@example.com', %(password)s,
+       jsonb_build_object('full_name', 'Patient ' || i, 'role', 'patient')
+from generate_series(1, %(patients)s) i
+union all
+select md5('local-admin')::uuid, 'admin@example.com', %(password)s,
+       jsonb_build_object('full_name', 'Local Admin', 'role', 'admin');
+
+insert into public.profiles (id, full_name, role, medical_history)
+select id, raw_user_meta_data ->> 'full_name', raw_user_meta_data ->> 'role',
+       case when email like 'patient%%' and abs(hashtext(email)) %% 3 = 0 then 'Hypertension' end
+from auth.users
+where email like '%%@example.com';
+
+insert into public.doctors (id, specialization, available_days, start_time, end_time, consultation_fee)
+select md5('local-doctor-' || i)::uuid,
+       (array['General', 'Cardiology', 'Dermatology', 'Pediatrics', 'Orthopedics'])[1 + i %% 5],
+       array['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'],
+       '09:00', '17:00', 300 + (i %% 5) * 100
+from generate_series(1, %(doctors)s) i;
+
+-- Eight hourly slots per doctor per day, half in the past and half ahead
+insert into public.appointments (patient_id, doctor_id, appointment_date, status, notes)
+select md5('local-patient-' || (1 + abs(hashtext('patient-' || i)) %% %(patients)s))::uuid,
+       md5('local-doctor-' || (1 + i %% %(doctors)s))::uuid,
+       slot,
+       case when slot > now() then (array['pending', 'confirmed'])[1 + i %% 2]
+            when abs(hashtext('status-' || i)) %% 10 = 0 then 'cancelled'
+            else 'completed' end,
+       'seeded'
+from (
+  select i, date_trunc('day', now())
+            - (%(appointments)s / %(doctors)s / 16) * interval '1 day'
+            + (i / %(doctors)s / 8) * interval '1 day'
+            + (9 + (i / %(doctors)s) %% 8) * interval '1 hour' as slot
+  from generate_series(0, %(appointments)s - 1) i
+) s;
+
+insert into public.prescriptions (appointment_id, medicines, diagnosis)
+select id, '[{"name": "Paracetamol", "dosage": "500mg", "frequency": "Twice a day"}]'::jsonb, 'Fever'
+from public.appointments
+where status = 'completed' and notes = 'seeded' and random() < 0.5;
+"""
+
+def init_database(conn, schema_path):
+    with conn.cursor() as cur:
+        cur.execute("select to_regclass('public.profiles') is not null")
+        if cur.fetchone()[0]:
+            raise ValueError("schema.sql is already loaded in this database")
+        for path in (os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_supabase.sql"), schema_path):
+            with open(path) as f:
+                cur.execute(f.read())
+    conn.commit()
+
+def seed_database(conn, doctors, patients, appointments):
+    with conn.cursor() as cur:
+        cur.execute("select 1 from auth.users where email = 'doctor1@example.com'")
+        if cur.fetchone():
+            return False
+        cur.execute(SEED_SQL, {
+            "doctors": doctors, "patients": patients, "appointments": appointments,
+            "password": hash_password(LOCAL_PASSWORD),
+        })
+    conn.commit()
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Local PostgREST/GoTrue stand-in backed by DATABASE_URL.")
+    parser.add_argument("--port", type=int, default=int(os.getenv("LOCAL_SUPABASE_PORT", DEFAULT_PORT)))
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--init", action="store_true", help="load local_supabase.sql and schema.sql into an empty database")
+    parser.add_argument("--schema", default="schema.sql", help="schema file for --init")
+    parser.add_argument("--seed", nargs=3, type=int, metavar=("DOCTORS", "PATIENTS", "APPOINTMENTS"),
+                        help="create test accounts and appointments, then exit")
+    args = parser.parse_args()
+
+    dsn = os.getenv("DATABASE_URL")
+    if not dsn:
+        print("Error: DATABASE_URL is missing")
+        sys.exit(1)
+
+    if args.init or args.seed:
+        conn = psycopg2.connect(dsn)
+        try:
+            if args.init:
+                init_database(conn, args.schema)
+                print(f"✅ Loaded local_supabase.sql and {args.schema}")
+            if args.seed:
+                started = time.perf_counter()
+                if seed_database(conn, *args.seed):
+                    print(f"✅ Seeded {args.seed[0]} doctors, {args.seed[1]} patients, {args.seed[2]} appointments "
+                          f"in {time.perf_counter() - started:.1f}s (password: {LOCAL_PASSWORD})")
+                else:
+                    print("Seed data already present, skipping")
+        except (ValueError, psycopg2.Error) as e:
+            conn.rollback()
+            print(f"❌ Setup failed: {e}")
+            sys.exit(1)
+        finally:
+            conn.close()
+        return
+
+    server = make_server(dsn, os.getenv("SUPABASE_JWT_SECRET") or DEFAULT_JWT_SECRET, args.port, args.pool_size)
+    print(f"Local Supabase listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
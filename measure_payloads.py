@@ -0,0 +1,104 @@
+import os
+import sys
+from dotenv import load_dotenv
+from supabase import create_client
+
+# Measures how many bytes each page pulls from Supabase, with the column
+# projections in app/projections.py and with every projection widened back to
+# select('*') (embeds kept), against a real project with some data in it.
+#
+# Usage: PATIENT_EMAIL=... PATIENT_PASSWORD=... DOCTOR_EMAIL=... DOCTOR_PASSWORD=... python measure_payloads.py
+# Either account can be left out to measure only the other role's pages.
+
+load_dotenv()
+
+from app import create_app
+from app.projections import PROJECTIONS
+from app.metrics import REQUEST_UPSTREAM_BYTES
+from app.cache import get_cache
+from app.directory import DIRECTORY_KEY
+
+PAGES = {
+    "patient": [
+        ("patient.dashboard", "/patient/dashboard"),
+        ("patient.view_doctors", "/patient/doctors"),
+        ("patient.appointment_history", "/patient/appointments/history?limit=200"),
+        ("patient.profile", "/patient/profile"),
+        ("patient.prescriptions", "/patient/prescriptions"),
+        ("patient.billing", "/patient/billing"),
+    ],
+    "doctor": [
+        ("doctor.dashboard", "/doctor/dashboard"),
+        ("doctor.patients", "/doctor/patients"),
+        ("doctor.transactions", "/doctor/transactions"),
+        ("doctor.schedule", "/doctor/schedule"),
+    ],
+}
+
+def widen(spec):
+    """Replace the plain columns of a select spec with '*', keeping its embeds."""
+    parts, depth, current = [], 0, ""
+    for ch in spec:
+        if ch == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        current += ch
+    parts.append(current.strip())
+    return ", ".join(["*"] + [p for p in parts if "(" in p])
+
+def sign_in(email, password):
+    client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    return client.auth.sign_in_with_password({"email": email, "password": password}).session.access_token
+
+app = create_app()
+projected = dict(PROJECTIONS)
+wide = {view: widen(spec) for view, spec in projected.items()}
+
+tokens = {}
+for role in PAGES:
+    email, password = os.getenv(f"{role.upper()}_EMAIL"), os.getenv(f"{role.upper()}_PASSWORD")
+    if email and password:
+        try:
+            tokens[role] = sign_in(email, password)
+        except Exception as e:
+            print(f"❌ {role} login failed: {e}")
+
+if not tokens:
+    print("Error: set PATIENT_EMAIL/PATIENT_PASSWORD and/or DOCTOR_EMAIL/DOCTOR_PASSWORD")
+    exit(1)
+
+def measure(projections):
+    PROJECTIONS.update(projections)
+    results = {}
+    for role, token in tokens.items():
+        client = app.test_client()
+        client.set_cookie("access_token", token)
+        for endpoint, path in PAGES[role]:
+            # The doctor directory is cached; drop it so both runs fetch it
+            get_cache().invalidate(DIRECTORY_KEY)
+            _, before = REQUEST_UPSTREAM_BYTES.totals(endpoint)
+            response = client.get(path)
+            _, after = REQUEST_UPSTREAM_BYTES.totals(endpoint)
+            results[endpoint] = (response.status_code, int(after - before), len(response.data))
+    return results
+
+print("--- Upstream bytes per page: select('*') vs. projected columns ---")
+wide_results = measure(wide)
+projected_results = measure(projected)
+
+print(f"{'endpoint':<30}{'status':>7}{'select *':>12}{'projected':>12}{'saved':>8}{'page bytes':>12}")
+total_wide = total_projected = 0
+for endpoint, (status, wide_bytes, _) in wide_results.items():
+    _, projected_bytes, page_bytes = projected_results[endpoint]
+    total_wide += wide_bytes
+    total_projected += projected_bytes
+    saved = 1 - projected_bytes / wide_bytes if wide_bytes else 0
+    print(f"{endpoint:<30}{status:>7}{wide_bytes:>12}{projected_bytes:>12}{saved:>7.0%}{page_bytes:>12}")
+print(f"{'total':<37}{total_wide:>12}{total_projected:>12}")
+
+if total_projected > total_wide:
+    print("❌ Projected pages transfer more than select('*')")
+    sys.exit(1)
@@ -78,11 +78,21 @@ create policy "Patients can create appointments"
 
 create policy "Doctors can update status of assigned appointments"
   on public.appointments for update
-  using ( auth.uid() = doctor_id );
+  using ( auth.uid() = doctor_id )
+  with check ( auth.uid() = doctor_id );
 
+-- A completed visit is billed (see bill_completed_appointment), so patients can no
+-- longer cancel or move it
 create policy "Patients can cancel (update) own appointments"
   on public.appointments for update
-  using ( auth.uid() = patient_id );
+  using ( auth.uid() = patient_id and status is distinct from 'completed' )
+  with check ( auth.uid() = patient_id );
+
+-- Only the status and the date (reschedule_appointment) change after booking;
+-- who an appointment belongs to never does, since doctors' access to a patient's
+-- records follows it
+revoke update on public.appointments from anon, authenticated;
+grant update (status, appointment_date) on public.appointments to authenticated;
 
 -- Prescriptions
 create table public.prescriptions (
@@ -116,3 +126,943 @@ create policy "Doctors can create prescriptions"
 -- This typically is done in the UI or via SQL:
 alter publication supabase_realtime add table public.appointments;
 alter publication supabase_realtime add table public.doctors;
+
+-- Billing ledger
+-- One entry per completed appointment with the fee snapshotted at completion, so
+-- later fee changes don't rewrite past bills. Running totals and monthly rollups
+-- per patient and per doctor are kept alongside by triggers.
+create table public.billing_ledger (
+  id uuid default uuid_generate_v4() primary key,
+  appointment_id uuid references public.appointments(id) not null unique,
+  patient_id uuid references public.profiles(id) not null,
+  doctor_id uuid references public.doctors(id) not null,
+  fee numeric not null default 0,
+  billed_at timestamp with time zone not null, -- appointment date of the visit
+  created_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+create index billing_ledger_patient_idx on public.billing_ledger (patient_id, billed_at desc, id desc);
+create index billing_ledger_doctor_idx on public.billing_ledger (doctor_id, billed_at desc, id desc);
+
+-- role is 'patient' (amount billed) or 'doctor' (amount earned)
+create table public.billing_totals (
+  role text not null,
+  party_id uuid not null,
+  amount numeric not null default 0,
+  entries bigint not null default 0,
+  primary key (party_id, role)
+);
+
+create table public.billing_monthly (
+  role text not null,
+  party_id uuid not null,
+  month date not null, -- first day of the month, UTC
+  amount numeric not null default 0,
+  entries bigint not null default 0,
+  primary key (party_id, role, month)
+);
+
+alter table public.billing_ledger enable row level security;
+alter table public.billing_totals enable row level security;
+alter table public.billing_monthly enable row level security;
+
+create policy "Patients and doctors can view their ledger entries"
+  on public.billing_ledger for select
+  using ( auth.uid() = patient_id or auth.uid() = doctor_id );
+
+create policy "Users can view their billing totals"
+  on public.billing_totals for select
+  using ( auth.uid() = party_id );
+
+create policy "Users can view their monthly billing"
+  on public.billing_monthly for select
+  using ( auth.uid() = party_id );
+
+create or replace function public.bump_billing(p_entry public.billing_ledger, p_sign int)
+returns void
+language sql
+security definer
+set search_path = public
+as $$
+  insert into public.billing_totals (role, party_id, amount, entries)
+  values ('patient', p_entry.patient_id, p_sign * p_entry.fee, p_sign),
+         ('doctor', p_entry.doctor_id, p_sign * p_entry.fee, p_sign)
+  on conflict (party_id, role) do update
+    set amount = billing_totals.amount + excluded.amount,
+        entries = billing_totals.entries + excluded.entries;
+
+  insert into public.billing_monthly (role, party_id, month, amount, entries)
+  values ('patient', p_entry.patient_id, date_trunc('month', p_entry.billed_at at time zone 'utc')::date, p_sign * p_entry.fee, p_sign),
+         ('doctor', p_entry.doctor_id, date_trunc('month', p_entry.billed_at at time zone 'utc')::date, p_sign * p_entry.fee, p_sign)
+  on conflict (party_id, role, month) do update
+    set amount = billing_monthly.amount + excluded.amount,
+        entries = billing_monthly.entries + excluded.entries;
+$$;
+
+-- Only the ledger trigger may move totals; keep it off the RPC API
+revoke execute on function public.bump_billing(public.billing_ledger, int) from public, anon, authenticated;
+
+create or replace function public.track_billing_totals()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  if tg_op = 'DELETE' then
+    perform public.bump_billing(old, -1);
+  else
+    perform public.bump_billing(new, 1);
+  end if;
+  return null;
+end;
+$$;
+
+create trigger billing_ledger_totals
+  after insert or delete on public.billing_ledger
+  for each row execute function public.track_billing_totals();
+
+-- Bill an appointment when it becomes completed; drop the entry if its doctor
+-- moves it back out of completed (e.g. marked by mistake). Patients cannot update
+-- completed appointments and reschedule_appointment skips them, so only the
+-- doctor can reverse a bill.
+create or replace function public.bill_completed_appointment()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  if new.status = 'completed' and (tg_op = 'INSERT' or old.status is distinct from 'completed') then
+    insert into public.billing_ledger (appointment_id, patient_id, doctor_id, fee, billed_at)
+    select new.id, new.patient_id, new.doctor_id, coalesce(d.consultation_fee, 0), new.appointment_date
+    from public.doctors d
+    where d.id = new.doctor_id
+    on conflict (appointment_id) do nothing;
+  elsif tg_op = 'UPDATE' and old.status = 'completed' and new.status is distinct from 'completed' then
+    delete from public.billing_ledger where appointment_id = new.id;
+  end if;
+  return null;
+end;
+$$;
+
+create trigger appointments_billing
+  after insert or update of status on public.appointments
+  for each row execute function public.bill_completed_appointment();
+
+-- Backfill appointments completed before the ledger existed (at the current fee,
+-- the best record available for them)
+insert into public.billing_ledger (appointment_id, patient_id, doctor_id, fee, billed_at)
+select a.id, a.patient_id, a.doctor_id, coalesce(d.consultation_fee, 0), a.appointment_date
+from public.appointments a
+join public.doctors d on d.id = a.doctor_id
+where a.status = 'completed'
+on conflict (appointment_id) do nothing;
+
+-- Patient dashboard in a single round-trip
+-- Returns the appointment list (with doctor name/specialization), total billed
+-- (from the billing ledger totals) and the prescription count for the calling patient.
+-- security invoker keeps the RLS policies above in force.
+create or replace function public.patient_dashboard()
+returns json
+language sql
+stable
+security invoker
+as $$
+  select json_build_object(
+    'appointments', coalesce((
+      select json_agg(json_build_object(
+        'id', a.id,
+        'doctor_id', a.doctor_id,
+        'appointment_date', a.appointment_date,
+        'status', a.status,
+        'notes', a.notes,
+        'doctors', json_build_object(
+          'specialization', d.specialization,
+          'profiles', json_build_object('full_name', p.full_name)
+        )
+      ) order by a.appointment_date)
+      from public.appointments a
+      join public.doctors d on d.id = a.doctor_id
+      left join public.profiles p on p.id = d.id
+      where a.patient_id = auth.uid()
+    ), '[]'::json),
+    'total_spent', coalesce((
+      select amount from public.billing_totals
+      where party_id = auth.uid() and role = 'patient'
+    ), 0),
+    'prescriptions_count', (
+      select count(*)
+      from public.prescriptions rx
+      join public.appointments a on a.id = rx.appointment_id
+      where a.patient_id = auth.uid()
+    )
+  );
+$$;
+
+grant execute on function public.patient_dashboard() to authenticated;
+
+-- Doctor dashboard analytics, aggregated in SQL
+-- Status counts, total earnings and the 12-bucket monthly income (by month of
+-- appointment_date, UTC) for the calling doctor, read from the billing ledger
+-- rollups so past visits keep the fee they were billed at.
+create or replace function public.doctor_dashboard_stats()
+returns json
+language sql
+stable
+security invoker
+as $$
+  with counts as (
+    select status, count(*) as n
+    from public.appointments
+    where doctor_id = auth.uid()
+    group by status
+  ),
+  monthly as (
+    select extract(month from month)::int as month, sum(amount) as amount
+    from public.billing_monthly
+    where party_id = auth.uid() and role = 'doctor'
+    group by 1
+  )
+  select json_build_object(
+    'total_appointments', (select coalesce(sum(n), 0) from counts),
+    'status_counts', (select coalesce(json_object_agg(status, n), '{}'::json) from counts),
+    'fee', coalesce((select consultation_fee from public.doctors where id = auth.uid()), 0),
+    'total_earnings', coalesce((select amount from public.billing_totals where party_id = auth.uid() and role = 'doctor'), 0),
+    'monthly_income', (
+      select json_agg(coalesce(m.amount, 0) order by gs.month)
+      from generate_series(1, 12) as gs(month)
+      left join monthly m on m.month = gs.month
+    )
+  );
+$$;
+
+grant execute on function public.doctor_dashboard_stats() to authenticated;
+
+-- Atomic slot booking
+-- A doctor can hold only one active (not cancelled) appointment per timestamp.
+-- Existing duplicate active bookings must be cancelled before this index can be built.
+create unique index appointments_doctor_slot_active_idx
+  on public.appointments (doctor_id, appointment_date)
+  where status <> 'cancelled';
+
+-- Books a slot for the calling patient in one statement.
+-- Returns {"status": "booked", "data": [row]} or {"status": "conflict"}.
+create or replace function public.book_appointment(p_doctor_id uuid, p_appointment_date timestamp with time zone, p_notes text default '')
+returns json
+language plpgsql
+security invoker
+as $$
+declare
+  booked public.appointments;
+begin
+  insert into public.appointments (patient_id, doctor_id, appointment_date, notes, status)
+  values (auth.uid(), p_doctor_id, p_appointment_date, p_notes, 'pending')
+  on conflict (doctor_id, appointment_date) where status <> 'cancelled' do nothing
+  returning * into booked;
+
+  if booked.id is null then
+    return json_build_object('status', 'conflict');
+  end if;
+  return json_build_object('status', 'booked', 'data', json_build_array(row_to_json(booked)));
+end;
+$$;
+
+-- Moves an appointment to a new slot, relying on the same index for conflicts.
+-- Returns {"status": "rescheduled", "data": [row]}, {"status": "conflict"} or {"status": "not_found"}.
+create or replace function public.reschedule_appointment(p_appointment_id uuid, p_appointment_date timestamp with time zone)
+returns json
+language plpgsql
+security invoker
+as $$
+declare
+  moved public.appointments;
+begin
+  update public.appointments
+  set appointment_date = p_appointment_date, status = 'pending'
+  where id = p_appointment_id
+  and status is distinct from 'completed'
+  returning * into moved;
+
+  if moved.id is null then
+    return json_build_object('status', 'not_found');
+  end if;
+  return json_build_object('status', 'rescheduled', 'data', json_build_array(row_to_json(moved)));
+exception when unique_violation then
+  return json_build_object('status', 'conflict');
+end;
+$$;
+
+grant execute on function public.book_appointment(uuid, timestamp with time zone, text) to authenticated;
+grant execute on function public.reschedule_appointment(uuid, timestamp with time zone) to authenticated;
+
+-- Busy slots for availability listings
+-- Patients cannot read other patients' appointments through RLS, so this exposes
+-- only (doctor_id, appointment_date) of active bookings in a time window.
+create or replace function public.doctor_busy_slots(p_doctor_ids uuid[], p_from timestamp with time zone, p_to timestamp with time zone)
+returns table (doctor_id uuid, appointment_date timestamp with time zone)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+  select a.doctor_id, a.appointment_date
+  from public.appointments a
+  where a.doctor_id = any(p_doctor_ids)
+  and a.appointment_date >= p_from
+  and a.appointment_date < p_to
+  and a.status <> 'cancelled'
+  order by a.doctor_id, a.appointment_date;
+$$;
+
+grant execute on function public.doctor_busy_slots(uuid[], timestamp with time zone, timestamp with time zone) to authenticated;
+
+-- Batch processing for doctors
+-- Both functions run in one transaction and return one result per input item:
+-- {"appointment_id", "ok", "data" | "error"}. Items for appointments that are not
+-- assigned to the calling doctor are reported as not found, and items that would
+-- reactivate a slot someone else has booked since as "Slot unavailable".
+create or replace function public.doctor_batch_update_status(p_updates json)
+returns json
+language plpgsql
+security invoker
+as $$
+declare
+  item json;
+  updated public.appointments;
+  results json[] := '{}';
+begin
+  for item in select value from json_array_elements(p_updates) loop
+    if coalesce(item->>'status', '') not in ('confirmed', 'cancelled') then
+      results := results || json_build_object('appointment_id', item->>'appointment_id', 'ok', false, 'error', 'Invalid status');
+      continue;
+    end if;
+
+    begin
+      update public.appointments
+      set status = item->>'status'
+      where id = (item->>'appointment_id')::uuid
+      and doctor_id = auth.uid()
+      returning * into updated;
+    exception when unique_violation then
+      -- e.g. confirming a cancelled appointment whose slot was rebooked
+      results := results || json_build_object('appointment_id', item->>'appointment_id', 'ok', false, 'error', 'Slot unavailable');
+      continue;
+    end;
+
+    if updated.id is null then
+      results := results || json_build_object('appointment_id', item->>'appointment_id', 'ok', false, 'error', 'Appointment not found');
+    else
+      results := results || json_build_object('appointment_id', updated.id, 'ok', true, 'data', row_to_json(updated));
+    end if;
+  end loop;
+  return array_to_json(results);
+end;
+$$;
+
+-- Doctors need to read back what they prescribe (also used by doctor.patient_details)
+create policy "Doctors can view prescriptions they issued"
+  on public.prescriptions for select
+  using ( exists (
+    select 1 from public.appointments
+    where appointments.id = prescriptions.appointment_id
+    and appointments.doctor_id = auth.uid()
+  ));
+
+-- Marks each appointment completed and inserts its prescription.
+create or replace function public.doctor_bulk_prescribe(p_prescriptions json)
+returns json
+language plpgsql
+security invoker
+as $$
+declare
+  item json;
+  completed public.appointments;
+  created public.prescriptions;
+  results json[] := '{}';
+begin
+  for item in select value from json_array_elements(p_prescriptions) loop
+    begin
+      update public.appointments
+      set status = 'completed'
+      where id = (item->>'appointment_id')::uuid
+      and doctor_id = auth.uid()
+      returning * into completed;
+
+      if completed.id is null then
+        results := results || json_build_object('appointment_id', item->>'appointment_id', 'ok', false, 'error', 'Appointment not found');
+        continue;
+      end if;
+
+      insert into public.prescriptions (appointment_id, diagnosis, medicines)
+      values (completed.id, item->>'diagnosis', (item->'medicines')::jsonb)
+      returning * into created;
+    exception when unique_violation then
+      -- The item's update and insert are rolled back together
+      results := results || json_build_object('appointment_id', item->>'appointment_id', 'ok', false, 'error', 'Slot unavailable');
+      continue;
+    end;
+
+    results := results || json_build_object('appointment_id', completed.id, 'ok', true, 'data', row_to_json(created));
+  end loop;
+  return array_to_json(results);
+end;
+$$;
+
+grant execute on function public.doctor_batch_update_status(json) to authenticated;
+grant execute on function public.doctor_bulk_prescribe(json) to authenticated;
+
+-- Hospital summary, maintained incrementally
+-- Triggers keep running totals so admin.hospital_summary never scans the base tables.
+create table public.hospital_counters (
+  name text primary key,
+  value bigint not null default 0
+);
+
+-- Appointments per day (UTC), doctor and status; per-day, per-status and
+-- per-doctor breakdowns are sums over this table.
+create table public.appointment_daily_stats (
+  day date not null,
+  doctor_id uuid not null,
+  status text not null,
+  appointments bigint not null default 0,
+  primary key (day, doctor_id, status)
+);
+
+-- All-time totals per doctor and status, so the per-status and per-doctor
+-- breakdowns sum a few rows per doctor instead of every day. Keyed by doctor
+-- (not one hospital-wide row per status) so concurrent bookings and batch
+-- updates only contend on the rows of the doctor they touch.
+create table public.appointment_doctor_status_stats (
+  doctor_id uuid not null,
+  status text not null,
+  appointments bigint not null default 0,
+  primary key (doctor_id, status)
+);
+
+alter table public.hospital_counters enable row level security;
+alter table public.appointment_daily_stats enable row level security;
+alter table public.appointment_doctor_status_stats enable row level security;
+
+create policy "Admins can view hospital counters"
+  on public.hospital_counters for select
+  using ( exists (select 1 from public.profiles where id = auth.uid() and role = 'admin') );
+
+create policy "Admins can view appointment stats"
+  on public.appointment_daily_stats for select
+  using ( exists (select 1 from public.profiles where id = auth.uid() and role = 'admin') );
+
+create policy "Admins can view appointment doctor status stats"
+  on public.appointment_doctor_status_stats for select
+  using ( exists (select 1 from public.profiles where id = auth.uid() and role = 'admin') );
+
+create or replace function public.bump_hospital_counter(p_name text, p_delta bigint)
+returns void
+language sql
+security definer
+set search_path = public
+as $$
+  insert into public.hospital_counters (name, value) values (p_name, p_delta)
+  on conflict (name) do update set value = hospital_counters.value + excluded.value;
+$$;
+
+-- Applies an appointment change (old row -> new row; either may be null) to both
+-- stats tables. Each table is upserted once, in key order, and the doctor/status
+-- rows before the daily rows, so concurrent changes (a reschedule moving
+-- confirmed -> pending against a batch confirming pending -> confirmed) always
+-- lock counter rows in the same order and cannot deadlock on them.
+create or replace function public.bump_appointment_stats(p_old public.appointments, p_new public.appointments)
+returns void
+language sql
+security definer
+set search_path = public
+as $$
+  insert into public.appointment_doctor_status_stats (doctor_id, status, appointments)
+  select doctor_id, coalesce(status, 'pending'), sum(delta)
+  from (values (p_old.doctor_id, p_old.status, -1), (p_new.doctor_id, p_new.status, 1)) d (doctor_id, status, delta)
+  where doctor_id is not null
+  group by 1, 2
+  having sum(delta) <> 0
+  order by 1, 2
+  on conflict (doctor_id, status) do update set appointments = appointment_doctor_status_stats.appointments + excluded.appointments;
+
+  insert into public.appointment_daily_stats (day, doctor_id, status, appointments)
+  select day, doctor_id, coalesce(status, 'pending'), sum(delta)
+  from (values ((p_old.appointment_date at time zone 'utc')::date, p_old.doctor_id, p_old.status, -1),
+               ((p_new.appointment_date at time zone 'utc')::date, p_new.doctor_id, p_new.status, 1)) d (day, doctor_id, status, delta)
+  where doctor_id is not null
+  group by 1, 2, 3
+  having sum(delta) <> 0
+  order by 1, 2, 3
+  on conflict (day, doctor_id, status) do update set appointments = appointment_daily_stats.appointments + excluded.appointments;
+$$;
+
+-- Only the track_* triggers below may move the counters; keep the helpers off the RPC API
+revoke execute on function public.bump_hospital_counter(text, bigint) from public, anon, authenticated;
+revoke execute on function public.bump_appointment_stats(public.appointments, public.appointments) from public, anon, authenticated;
+
+create or replace function public.track_profile_counts()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') and old.role = 'patient' then
+    perform public.bump_hospital_counter('total_patients', -1);
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') and new.role = 'patient' then
+    perform public.bump_hospital_counter('total_patients', 1);
+  end if;
+  return null;
+end;
+$$;
+
+create or replace function public.track_doctor_counts()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  perform public.bump_hospital_counter('total_doctors', case when tg_op = 'INSERT' then 1 else -1 end);
+  return null;
+end;
+$$;
+
+create or replace function public.track_appointment_stats()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  -- old is null on insert and new is null on delete
+  perform public.bump_appointment_stats(old, new);
+  return null;
+end;
+$$;
+
+create trigger profiles_hospital_counts
+  after insert or delete or update of role on public.profiles
+  for each row execute function public.track_profile_counts();
+
+create trigger doctors_hospital_counts
+  after insert or delete on public.doctors
+  for each row execute function public.track_doctor_counts();
+
+create trigger appointments_daily_stats
+  after insert or delete or update of appointment_date, doctor_id, status on public.appointments
+  for each row execute function public.track_appointment_stats();
+
+-- Backfill from existing rows (the triggers only see changes from here on)
+insert into public.hospital_counters (name, value)
+select 'total_patients', count(*) from public.profiles where role = 'patient'
+union all
+select 'total_doctors', count(*) from public.doctors
+on conflict (name) do update set value = excluded.value;
+
+insert into public.appointment_daily_stats (day, doctor_id, status, appointments)
+select (appointment_date at time zone 'utc')::date, doctor_id, coalesce(status, 'pending'), count(*)
+from public.appointments
+group by 1, 2, 3
+on conflict (day, doctor_id, status) do update set appointments = excluded.appointments;
+
+insert into public.appointment_doctor_status_stats (doctor_id, status, appointments)
+select doctor_id, coalesce(status, 'pending'), count(*) from public.appointments group by 1, 2
+on conflict (doctor_id, status) do update set appointments = excluded.appointments;
+
+-- Admin summary from the counters: totals plus per-day (p_days either side of
+-- today), per-status and per-doctor breakdowns. Returns null for non-admins.
+create or replace function public.hospital_summary(p_days int default 7)
+returns json
+language sql
+stable
+security definer
+set search_path = public
+as $$
+  select case when not exists (
+    select 1 from public.profiles where id = auth.uid() and role = 'admin'
+  ) then null else json_build_object(
+    'total_patients', coalesce((select value from public.hospital_counters where name = 'total_patients'), 0),
+    'total_doctors', coalesce((select value from public.hospital_counters where name = 'total_doctors'), 0),
+    'todays_appointments', (
+      select coalesce(sum(appointments), 0) from public.appointment_daily_stats
+      where day >= (now() at time zone 'utc')::date
+    ),
+    'by_day', (
+      select coalesce(json_object_agg(day, n order by day), '{}'::json)
+      from (
+        select day, sum(appointments) as n from public.appointment_daily_stats
+        where day between (now() at time zone 'utc')::date - p_days and (now() at time zone 'utc')::date + p_days
+        group by day
+        having sum(appointments) <> 0
+      ) d
+    ),
+    'by_status', (
+      select coalesce(json_object_agg(status, n), '{}'::json)
+      from (
+        select status, sum(appointments) as n from public.appointment_doctor_status_stats
+        group by status
+        having sum(appointments) <> 0
+      ) s
+    ),
+    'by_doctor', (
+      select coalesce(json_agg(json_build_object('doctor_id', t.doctor_id, 'full_name', p.full_name, 'appointments', t.n) order by t.n desc), '[]'::json)
+      from (
+        select doctor_id, sum(appointments) as n from public.appointment_doctor_status_stats
+        group by doctor_id
+        having sum(appointments) <> 0
+      ) t
+      left join public.profiles p on p.id = t.doctor_id
+    )
+  ) end;
+$$;
+
+grant execute on function public.hospital_summary(int) to authenticated;
+
+-- Doctor's patient roster
+-- One row per patient with visit stats, keyset-paginated on (name, id) with an
+-- optional name search, so the payload scales with patients rather than visits.
+create index if not exists appointments_doctor_patient_idx
+  on public.appointments (doctor_id, patient_id, appointment_date);
+
+create or replace function public.doctor_patient_roster(
+  p_search text default null,
+  p_after_name text default null,
+  p_after_id uuid default null,
+  p_limit int default 50
+)
+returns json
+language sql
+stable
+security invoker
+set search_path = public
+as $$
+  select coalesce(json_agg(r order by r.name, r.id), '[]'::json)
+  from (
+    select p.id,
+           coalesce(p.full_name, '') as name,
+           p.medical_history as history,
+           v.last_visit,
+           v.visit_count,
+           v.next_appointment
+    from (
+      select patient_id,
+             max(appointment_date) filter (where appointment_date <= now() and status <> 'cancelled') as last_visit,
+             count(*) filter (where appointment_date <= now() and status <> 'cancelled') as visit_count,
+             min(appointment_date) filter (where appointment_date > now() and status <> 'cancelled') as next_appointment
+      from public.appointments
+      where doctor_id = auth.uid()
+      group by patient_id
+    ) v
+    join public.profiles p on p.id = v.patient_id
+    where (p_search is null or p.full_name ilike '%' || p_search || '%')
+      and (p_after_id is null or (coalesce(p.full_name, ''), p.id) > (coalesce(p_after_name, ''), p_after_id))
+    order by coalesce(p.full_name, ''), p.id
+    limit least(greatest(p_limit, 1), 201)
+  ) r;
+$$;
+
+grant execute on function public.doctor_patient_roster(text, text, uuid, int) to authenticated;
+
+-- Indexes for the hot filters
+-- Each matches a query in the blueprints or an RLS policy; benchmark_query_plans.py
+-- times them with and without these in place. A doctor's appointments by date are
+-- served by appointments_doctor_slot_active_idx (active bookings) and
+-- appointments_doctor_patient_idx, so there is no separate (doctor_id, appointment_date) index.
+create index if not exists appointments_patient_date_idx
+  on public.appointments (patient_id, appointment_date, id);
+
+create index if not exists appointments_doctor_completed_idx
+  on public.appointments (doctor_id, appointment_date)
+  where status = 'completed';
+
+create index if not exists appointments_patient_completed_idx
+  on public.appointments (patient_id)
+  where status = 'completed';
+
+-- Used by the prescriptions RLS policies and every appointment -> prescription join
+create index if not exists prescriptions_appointment_id_idx
+  on public.prescriptions (appointment_id);
+
+-- Appointment change feed
+-- Each committed insert/update is sent on the appointment_changes channel; the app
+-- LISTENs once per process and forwards each change only to the patient and doctor
+-- it concerns (see app/events.py). Notes are left out to keep payloads small.
+-- A transaction that has notified takes a database-wide lock while it commits,
+-- which serializes committing bookings, so nothing is sent unless a listener is
+-- deployed (SERVING_MODE=gevent with DATABASE_URL) and this is switched on:
+--   alter database postgres set shm.live_updates = 'on';
+-- Without it pages poll for their appointments instead.
+create or replace function public.notify_appointment_change()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  -- bulk_data.py sets shm.bulk_import so a history import doesn't flood live dashboards
+  if coalesce(current_setting('shm.live_updates', true), '') <> 'on'
+     or current_setting('shm.bulk_import', true) = 'on' then
+    return null;
+  end if;
+  perform pg_notify('appointment_changes', json_build_object(
+    'event', lower(tg_op),
+    'id', new.id,
+    'patient_id', new.patient_id,
+    'doctor_id', new.doctor_id,
+    'appointment_date', new.appointment_date,
+    'status', new.status,
+    'old_status', case when tg_op = 'UPDATE' then old.status end,
+    'patient_name', (select full_name from public.profiles where id = new.patient_id),
+    'doctor_name', (select full_name from public.profiles where id = new.doctor_id)
+  )::text);
+  return null;
+end;
+$$;
+
+create trigger appointments_notify_change
+  after insert or update of appointment_date, status on public.appointments
+  for each row execute function public.notify_appointment_change();
+
+-- Prescription search and medication timeline
+-- Trigram indexes serve substring search on medicine names and diagnosis text,
+-- prescriptions_created_idx the unfiltered newest-first listing.
+create extension if not exists pg_trgm;
+
+-- Lower-cased medicine names of a prescription, space separated, for indexing
+create or replace function public.prescription_medicine_names(p_medicines jsonb)
+returns text
+language sql
+immutable
+as $$
+  select coalesce(lower(string_agg(m->>'name', ' ')), '')
+  from jsonb_array_elements(case when jsonb_typeof(p_medicines) = 'array' then p_medicines else '[]'::jsonb end) m;
+$$;
+
+create index if not exists prescriptions_medicine_names_trgm_idx
+  on public.prescriptions using gin (public.prescription_medicine_names(medicines) gin_trgm_ops);
+
+create index if not exists prescriptions_diagnosis_trgm_idx
+  on public.prescriptions using gin (diagnosis gin_trgm_ops);
+
+create index if not exists prescriptions_created_idx
+  on public.prescriptions (created_at desc, id desc);
+
+-- A doctor treating a patient can read the patient's earlier prescriptions from
+-- other doctors, not just the ones they issued themselves. Treating means a
+-- confirmed or completed appointment; a pending request the doctor hasn't
+-- accepted grants nothing. Other doctors' appointments are hidden from the
+-- caller by RLS, even inside a policy, so the checks run as the owner; they only
+-- ever answer about the caller.
+create or replace function public.doctor_treats_patient(p_patient_id uuid)
+returns boolean
+language sql
+stable
+security definer
+set search_path = public
+as $$
+  select exists (
+    select 1 from public.appointments
+    where patient_id = p_patient_id
+    and doctor_id = auth.uid()
+    and status in ('confirmed', 'completed')
+  );
+$$;
+
+-- Appointments of the patients the caller treats. The policy below checks
+-- against this set, which is built once per query rather than once per row.
+create or replace function public.treated_patient_appointment_ids()
+returns setof uuid
+language sql
+stable
+security definer
+set search_path = public
+as $$
+  select a.id from public.appointments a
+  where a.patient_id in (
+    select patient_id from public.appointments
+    where doctor_id = auth.uid() and status in ('confirmed', 'completed')
+  );
+$$;
+
+revoke execute on function public.doctor_treats_patient(uuid) from public, anon;
+revoke execute on function public.treated_patient_appointment_ids() from public, anon;
+grant execute on function public.doctor_treats_patient(uuid) to authenticated;
+grant execute on function public.treated_patient_appointment_ids() to authenticated;
+
+create policy "Doctors can view prescriptions of their patients"
+  on public.prescriptions for select
+  using ( appointment_id in (select public.treated_patient_appointment_ids()) );
+
+-- Prescriptions visible to the caller, newest first, keyset-paginated on
+-- (created_at, id). Every filter is optional; names and diagnosis match substrings.
+-- Runs as the owner so other doctors' appointments can be joined; visibility
+-- follows the prescriptions policies: own visits, issued by the caller, or a
+-- patient the caller treats (resolved once, not per row). The statement is built
+-- from the filters actually given, so each search is planned for its own
+-- filters (trigram, patient or created_at index) instead of one generic plan.
+create or replace function public.search_prescriptions(
+  p_patient_id uuid default null,
+  p_medicine text default null,
+  p_diagnosis text default null,
+  p_from timestamp with time zone default null,
+  p_to timestamp with time zone default null,
+  p_after_created timestamp with time zone default null,
+  p_after_id uuid default null,
+  p_limit int default 50
+)
+returns json
+language plpgsql
+stable
+security definer
+set search_path = public
+as $$
+declare
+  visible uuid[];
+  filters text[] := array['(a.patient_id = any($1) or a.doctor_id = auth.uid())'];
+  result json;
+begin
+  visible := array(
+    select distinct patient_id from public.appointments
+    where doctor_id = auth.uid() and status in ('confirmed', 'completed')
+  ) || auth.uid();
+
+  if p_patient_id is not null then
+    filters := filters || 'a.patient_id = $2'::text;
+  end if;
+  if p_medicine is not null then
+    filters := filters || $f$public.prescription_medicine_names(rx.medicines) like '%' || lower($3) || '%'$f$::text;
+  end if;
+  if p_diagnosis is not null then
+    filters := filters || $f$rx.diagnosis ilike '%' || $4 || '%'$f$::text;
+  end if;
+  if p_from is not null then
+    filters := filters || 'rx.created_at >= $5'::text;
+  end if;
+  if p_to is not null then
+    filters := filters || 'rx.created_at < $6'::text;
+  end if;
+  if p_after_created is not null and p_after_id is not null then
+    filters := filters || '(rx.created_at, rx.id) < ($7, $8)'::text;
+  end if;
+
+  execute format($q$
+    select coalesce(json_agg(r order by r.created_at desc, r.id desc), '[]'::json)
+    from (
+      select rx.id, rx.appointment_id, rx.created_at, rx.diagnosis, rx.medicines,
+             a.appointment_date, a.patient_id, pp.full_name as patient_name,
+             a.doctor_id, dp.full_name as doctor_name
+      from public.prescriptions rx
+      join public.appointments a on a.id = rx.appointment_id
+      left join public.profiles pp on pp.id = a.patient_id
+      left join public.profiles dp on dp.id = a.doctor_id
+      where %s
+      order by rx.created_at desc, rx.id desc
+      limit $9
+    ) r
+  $q$, array_to_string(filters, ' and '))
+  into result
+  using visible, p_patient_id, p_medicine, p_diagnosis, p_from, p_to, p_after_created, p_after_id,
+        least(greatest(p_limit, 1), 201);
+  return result;
+end;
+$$;
+
+-- One entry per medicine a patient has been prescribed: first and last time,
+-- how often, and the latest dosage/frequency and prescriber. Most recent first.
+-- Like search_prescriptions, runs as the owner and applies the same visibility.
+create or replace function public.patient_medication_timeline(p_patient_id uuid)
+returns json
+language sql
+stable
+security definer
+set search_path = public
+as $$
+  with allowed as (
+    -- Checked once, not per row: the patient themselves or a treating doctor sees everything
+    select p_patient_id = auth.uid() or public.doctor_treats_patient(p_patient_id) as everything
+  ),
+  items as (
+    select lower(m->>'name') as key, m->>'name' as name, m->>'dosage' as dosage,
+           m->>'frequency' as frequency, rx.id as prescription_id, rx.created_at,
+           dp.full_name as doctor_name
+    from public.prescriptions rx
+    join public.appointments a on a.id = rx.appointment_id
+    left join public.profiles dp on dp.id = a.doctor_id
+    cross join lateral jsonb_array_elements(
+      case when jsonb_typeof(rx.medicines) = 'array' then rx.medicines else '[]'::jsonb end
+    ) m
+    where a.patient_id = p_patient_id
+    and ((select everything from allowed) or a.doctor_id = auth.uid())
+    and coalesce(m->>'name', '') <> ''
+  ),
+  latest as (
+    select distinct on (key) key, name, dosage, frequency, prescription_id, created_at, doctor_name
+    from items
+    order by key, created_at desc
+  ),
+  summary as (
+    select key, min(created_at) as first_prescribed, max(created_at) as last_prescribed, count(*) as times
+    from items
+    group by key
+  )
+  select coalesce(json_agg(json_build_object(
+    'name', l.name,
+    'first_prescribed', s.first_prescribed,
+    'last_prescribed', s.last_prescribed,
+    'times_prescribed', s.times,
+    'latest', json_build_object('dosage', l.dosage, 'frequency', l.frequency,
+                                'prescription_id', l.prescription_id, 'doctor_name', l.doctor_name)
+  ) order by s.last_prescribed desc), '[]'::json)
+  from latest l
+  join summary s on s.key = l.key;
+$$;
+
+grant execute on function public.search_prescriptions(uuid, text, text, timestamp with time zone, timestamp with time zone, timestamp with time zone, uuid, int) to authenticated;
+grant execute on function public.patient_medication_timeline(uuid) to authenticated;
+
+-- Data version stamps
+-- Bumped by triggers whenever the rows behind a cached listing change. The app
+-- keeps the stamp next to its cached copy of those rows and uses it for ETags
+-- and as the key of rendered fragments, so repeat views need no database call.
+create table public.data_versions (
+  name text primary key,
+  version bigint not null default 0,
+  updated_at timestamp with time zone not null default now()
+);
+
+alter table public.data_versions enable row level security;
+
+create policy "Data versions are viewable by everyone"
+  on public.data_versions for select
+  using ( true );
+
+create or replace function public.bump_data_version()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  insert into public.data_versions (name, version, updated_at)
+  values (tg_argv[0], 1, now())
+  on conflict (name) do update set version = data_versions.version + 1, updated_at = now();
+  return null;
+end;
+$$;
+
+-- The doctor directory: doctor rows plus the doctors' names from profiles
+create trigger doctors_data_version
+  after insert or update or delete on public.doctors
+  for each statement execute function public.bump_data_version('doctors');
+
+create trigger doctor_profiles_data_version
+  after update of full_name on public.profiles
+  for each row
+  when (new.role = 'doctor' and old.full_name is distinct from new.full_name)
+  execute function public.bump_data_version('doctors');
+
+insert into public.data_versions (name, version) values ('doctors', 1)
+on conflict (name) do nothing;
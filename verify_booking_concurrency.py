@@ -0,0 +1,86 @@
+import os
+import sys
+import uuid
+import random
+import threading
+from dotenv import load_dotenv
+import psycopg2
+
+# Fires many parallel book_appointment() calls at one slot against a local Postgres
+# that has schema.sql loaded (plus the Supabase auth schema / authenticated role).
+# Exactly one booking must win; every other caller must get a conflict.
+#
+# Usage: DATABASE_URL=postgresql://postgres@localhost/shm python verify_booking_concurrency.py [workers]
+
+load_dotenv()
+
+dsn = os.getenv("DATABASE_URL")
+workers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+if not dsn:
+    print("Error: DATABASE_URL is missing")
+    exit(1)
+
+admin = psycopg2.connect(dsn)
+admin.autocommit = True
+cur = admin.cursor()
+
+cur.execute("select id from public.doctors limit 1")
+doctor = cur.fetchone()
+cur.execute("select id from public.profiles where role = 'patient' limit %s", (workers,))
+patients = [row[0] for row in cur.fetchall()]
+
+if not doctor or not patients:
+    print("Error: need at least one doctor and one patient in the database")
+    exit(1)
+
+doctor_id = doctor[0]
+# A slot far in the future so real bookings are never touched
+slot = f"2099-01-01T{random.randint(0, 23):02d}:{random.randint(0, 59):02d}:00+00:00"
+run_tag = f"concurrency-check-{uuid.uuid4()}"
+
+print(f"--- Booking {workers} parallel requests for doctor {doctor_id} at {slot} ---")
+
+barrier = threading.Barrier(workers)
+results = []
+lock = threading.Lock()
+
+def book(patient_id):
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    c = conn.cursor()
+    # Act as the patient the same way PostgREST does
+    c.execute("set role authenticated")
+    c.execute("select set_config('request.jwt.claim.sub', %s, false)", (str(patient_id),))
+    barrier.wait()
+    try:
+        c.execute("select public.book_appointment(%s, %s, %s)", (doctor_id, slot, run_tag))
+        status = c.fetchone()[0]["status"]
+    except Exception as e:
+        status = f"error: {e}"
+    with lock:
+        results.append(status)
+    conn.close()
+
+threads = [threading.Thread(target=book, args=(patients[i % len(patients)],)) for i in range(workers)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+
+booked = results.count("booked")
+conflicts = results.count("conflict")
+errors = [r for r in results if r not in ("booked", "conflict")]
+
+print(f"Booked: {booked}, Conflicts: {conflicts}, Errors: {len(errors)}")
+for e in errors[:5]:
+    print(f"  {e}")
+
+cur.execute("delete from public.appointments where notes = %s", (run_tag,))
+admin.close()
+
+if booked == 1 and conflicts == workers - 1:
+    print("✅ Exactly one booking won the slot.")
+else:
+    print("❌ Slot booking is not atomic.")
+    exit(1)
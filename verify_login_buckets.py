@@ -0,0 +1,47 @@
+import os
+import sys
+
+# Checks that login rate limits are kept per client behind the hosting router:
+# two clients forwarded by the same proxy get separate buckets, so bad logins
+# from one can't lock the account for the other. Needs no Supabase project;
+# login attempts fail against an unreachable URL after the limiter has run.
+#
+# Usage: python verify_login_buckets.py
+
+os.environ.update({
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_KEY": "verify",
+    "RATE_LIMIT_LOGIN": "2/3600",
+    "RATE_LIMIT_LOGIN_ROUTE": "0",
+    "PROXY_HOPS": "1",
+})
+os.environ.pop("RATE_LIMIT_URL", None)
+os.environ.pop("CACHE_URL", None)
+
+from app import create_app
+
+app = create_app()
+client = app.test_client()
+
+failures = []
+
+def check(name, ok):
+    print(f"{'✅' if ok else '❌'} {name}")
+    if not ok:
+        failures.append(name)
+
+def login(forwarded_for, email="victim@example.com"):
+    return client.post('/auth/login', data={"email": email, "password": "wrong", "role": "patient"},
+                       headers={"X-Forwarded-For": forwarded_for}, environ_base={"REMOTE_ADDR": "10.0.0.1"}).status_code
+
+attacker = [login("203.0.113.1") for _ in range(3)]
+check("one client is limited after its bad logins", attacker[:2] != [429, 429] and attacker[2] == 429)
+check("another client behind the same proxy can still log in", login("203.0.113.2") != 429)
+check("the limited client can still try other accounts", login("203.0.113.1", "other@example.com") != 429)
+# The router appends the address it saw; anything the client put before it is ignored
+check("a spoofed X-Forwarded-For entry doesn't pick a fresh bucket", login("198.51.100.7, 203.0.113.1") == 429)
+
+if failures:
+    print(f"❌ {len(failures)} check(s) failed")
+    sys.exit(1)
+print("✅ Login rate limits are kept per client.")
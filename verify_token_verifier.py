@@ -0,0 +1,98 @@
+import sys
+import time
+from types import SimpleNamespace
+import jwt
+from app.auth_cache import TokenCache, TokenVerifier
+
+# Checks the access-token verifier behind login_required without a network:
+# GoTrue is replaced by a local stub that knows a set of valid tokens and
+# counts how often it is asked.
+#
+# Usage: python verify_token_verifier.py
+
+SECRET = "verify-secret-verify-secret-000000"
+
+class StubAuth:
+    """Stands in for supabase.auth: get_user() answers for tokens in self.valid."""
+
+    def __init__(self):
+        self.valid = {}
+        self.calls = 0
+
+    def get_user(self, token):
+        self.calls += 1
+        user = self.valid.get(token)
+        return SimpleNamespace(user=user) if user else None
+
+def make_token(sub="user-1", secret=SECRET, expires_in=3600, audience="authenticated"):
+    return jwt.encode({
+        "sub": sub,
+        "email": f"{sub}@example.com",
+        "aud": audience,
+        "exp": int(time.time()) + expires_in,
+        "user_metadata": {"role": "patient"},
+    }, secret, algorithm="HS256")
+
+failures = []
+
+def check(name, ok):
+    print(f"{'✅' if ok else '❌'} {name}")
+    if not ok:
+        failures.append(name)
+
+# TokenCache
+cache = TokenCache(max_size=2, ttl=1)
+cache.put("a", "user-a")
+check("cache returns a stored user", cache.get("a") == "user-a")
+time.sleep(1.1)
+check("cache entries expire after the TTL", cache.get("a") is None)
+
+cache = TokenCache(max_size=2, ttl=300)
+cache.put("a", "user-a", exp=time.time() + 0.5)
+time.sleep(0.6)
+check("cache entries never outlive the token's exp", cache.get("a") is None)
+cache.put("gone", "user", exp=time.time() - 1)
+check("already expired tokens are not cached", len(cache) == 0)
+
+cache.put("a", "user-a")
+cache.put("b", "user-b")
+cache.get("a")
+cache.put("c", "user-c")
+check("least recently used entry is evicted past max_size", cache.get("b") is None and cache.get("a") == "user-a" and len(cache) == 2)
+cache.discard("a")
+check("discard drops an entry", cache.get("a") is None)
+
+# Local verification
+auth = StubAuth()
+verifier = TokenVerifier(auth, mode="local", jwt_secret=SECRET)
+token = make_token()
+user = verifier.verify(token)
+check("valid HS256 token is verified locally", user is not None and user.id == "user-1" and auth.calls == 0)
+check("claims are mapped to the user attributes the views read", user.user_metadata.get("role") == "patient" and user.email == "user-1@example.com")
+verifier.verify(token)
+check("repeat verification is a cache hit", verifier.stats["cache_hits"] == 1 and auth.calls == 0)
+
+check("expired token is rejected without asking GoTrue", verifier.verify(make_token(expires_in=-10)) is None and auth.calls == 0)
+
+foreign = make_token(sub="user-2", secret="some-other-secret-some-other-secret")
+auth.valid[foreign] = SimpleNamespace(id="user-2", user_metadata={"role": "doctor"})
+check("token with an unknown key falls back to GoTrue", getattr(verifier.verify(foreign), "id", None) == "user-2" and auth.calls == 1)
+check("unknown token is rejected by GoTrue", verifier.verify(make_token(sub="user-3", secret="nope-nope-nope-nope-nope-nope-nope")) is None)
+wrong_audience = make_token(sub="user-4", audience="anon")
+check("token for another audience is not accepted locally", verifier.verify(wrong_audience) is None)
+
+# Remote mode: GoTrue on every request, nothing cached
+auth = StubAuth()
+verifier = TokenVerifier(auth, mode="remote", jwt_secret=SECRET)
+token = make_token(sub="user-5")
+auth.valid[token] = SimpleNamespace(id="user-5", user_metadata={})
+check("remote mode verifies with GoTrue", getattr(verifier.verify(token), "id", None) == "user-5")
+verifier.verify(token)
+check("remote mode asks GoTrue every time", auth.calls == 2 and len(verifier.cache) == 0)
+del auth.valid[token]
+check("remote mode rejects a revoked session on the next request", verifier.verify(token) is None)
+
+if failures:
+    print(f"❌ {len(failures)} check(s) failed")
+    sys.exit(1)
+print("✅ Token verifier behaves as expected.")